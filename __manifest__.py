@@ -1,17 +1,18 @@
 {
     'name': 'Multi-Stage Approval System',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Purchases/Sales',
     'author': 'Moeed Nasir',
     'website': 'https://moeed-portfolio.netlify.app/',
     'summary': 'Multi-level approval workflow for Purchase and Sales',
-    'depends': ['purchase', 'sale', 'mail', 'stock'],
+    'depends': ['purchase', 'sale', 'mail', 'stock', 'resource'],
     'data': [
         'security/ir.model.access.csv',
         'security/approval_rules.xml',
         'data/approval_stages.xml',
         'data/approval_demo.xml',
         'data/mail_templates.xml',
+        'data/approval_cron.xml',
         'views/approval_flow_views.xml',
         'views/approval_stage_views.xml',
         'views/purchase_views.xml',
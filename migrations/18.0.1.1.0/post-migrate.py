@@ -0,0 +1,17 @@
+def migrate(cr, version):
+    """Move the escalation days saved under the misspelled key of earlier versions
+
+    The settings form and the escalation engine now only read
+    multi_stage_approval.escalation_days. A value already stored there
+    wins, as it did over the misspelled key at runtime.
+    """
+    cr.execute("""
+        INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+             SELECT 'multi_stage_approval.escalation_days', value, create_uid, create_date, write_uid, write_date
+               FROM ir_config_parameter
+              WHERE key = 'multi_stage_approval.escallation_days'
+        ON CONFLICT (key) DO UPDATE
+                SET value = EXCLUDED.value
+              WHERE COALESCE(ir_config_parameter.value, '') = ''
+    """)
+    cr.execute("DELETE FROM ir_config_parameter WHERE key = 'multi_stage_approval.escallation_days'")
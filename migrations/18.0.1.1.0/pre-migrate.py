@@ -0,0 +1,23 @@
+from odoo.tools import sql
+
+
+def migrate(cr, version):
+    """Backfill the document reference of existing approval history rows
+
+    The columns are created and filled here in two statements, so the ORM
+    finds them populated and does not recompute them row by row.
+    """
+    if not sql.table_exists(cr, 'approval_history'):
+        return
+    if not sql.column_exists(cr, 'approval_history', 'res_model'):
+        sql.create_column(cr, 'approval_history', 'res_model', 'varchar')
+    if not sql.column_exists(cr, 'approval_history', 'res_id'):
+        sql.create_column(cr, 'approval_history', 'res_id', 'int4')
+    cr.execute("""
+        UPDATE approval_history
+           SET res_model = CASE WHEN purchase_order_id IS NOT NULL
+                                THEN 'purchase.order' ELSE 'sale.order' END,
+               res_id = COALESCE(purchase_order_id, sale_order_id)
+         WHERE res_id IS NULL
+           AND COALESCE(purchase_order_id, sale_order_id) IS NOT NULL
+    """)
@@ -1,7 +1,13 @@
 from . import approval_flow
 from . import purchase_sale_inherit
 from . import approval_stage
+from . import approval_approver
 from . import approval_history
+from . import approval_settings
+from . import approval_tally
+from . import approval_idempotency
+from . import approval_engine
+from . import approval_calendar
 from . import advanced_approval
 from . import notification_system
 from . import approval_reports
\ No newline at end of file
@@ -9,56 +9,68 @@ class AdvancedApproval(models.Model):
     @api.model
     def _get_appropriate_flow(self, record):
         """Get flow based on order amount and conditions"""
-        domain = [
-            ('model', '=', record._name),
-            ('company_id', '=', record.company_id.id),
-            ('active', '=', True)
-        ]
-        flows = self.env['approval.flow'].search(domain)
-
-        for flow in flows:
-            # Check if this flow applies based on amount ranges and conditions
-            applicable_stages = flow.stage_ids.filtered(
-                lambda s: s.minimum_amount <= record.amount_total <= (s.maximum_amount or float('inf'))
-            )
-            if applicable_stages:
-                return flow
-        return flows[:1] if flows else False
+        flow, _stages = self._get_appropriate_flows(record)[record.id]
+        return flow or False
+
+    @api.model
+    def _get_appropriate_flows(self, records):
+        """Route a batch of orders through the compiled amount band index
+
+        Returns a {record_id: (flow, stages)} dict where stages are the
+        stages of the flow whose amount band contains the order total.
+        Orders without a flow get empty recordsets.
+        """
+        Flow = self.env['approval.flow']
+        Stage = self.env['approval.stage']
+        routing = Flow._get_routing_table()
+
+        result = {}
+        for record in records:
+            route = routing.get((record._name, record.company_id.id))
+            if not route:
+                result[record.id] = (Flow, Stage)
+                continue
+            stage_ids = route.band_index.lookup(record.amount_total)
+            result[record.id] = (Flow.browse(route.flow_id), Stage.browse(stage_ids))
+        return result
 
     def _handle_parallel_approval(self, record, stage):
         """Handle parallel approval stages with multiple approvers"""
-        approver_group = stage.role_id
-        approvers = self.env['res.users'].search([('groups_id', 'in', approver_group.ids)])
+        approvers = self.env['approval.approver.resolver']._get_approvers(stage.role_id)
 
         if stage.approval_type == 'parallel':
+            # Start counting approvals against the approvers required now
+            self.env['approval.parallel.tally']._open_tallies(record, stage)
+
             # Create approval tasks for all approvers
-            for approver in approvers:
-                record.activity_schedule(
-                    'multi_stage_approval.mail_activity_approval',
-                    user_id=approver.id,
-                    note=f'Parallel approval required for {record.name} at stage {stage.name}'
-                )
+            self.env['approval.engine']._schedule_approval_activities(
+                record,
+                [approver.user_id for approver in approvers],
+                summary=False,
+                notes={record.id: f'Parallel approval required for {record.name} at stage {stage.name}'},
+            )
             return True
         return False
 
     def _check_parallel_approval_complete(self, record, stage):
         """Check if parallel approval is complete"""
         if stage.approval_type == 'parallel':
-            # Check if all required approvers have approved
-            required_approvers = self.env['res.users'].search([
-                ('groups_id', 'in', stage.role_id.ids)
-            ])
+            tally = self.env['approval.parallel.tally']._get_tallies(record, stage)
+            if tally:
+                return tally._is_complete()
+
+            # Without a tally, check if all required approvers have approved
+            required_approvers = self.env['approval.approver.resolver']._get_approvers(stage.role_id)
 
             approved_history = self.env['approval.history'].search([
+                ('res_model', '=', record._name),
+                ('res_id', '=', record.id),
                 ('stage_id', '=', stage.id),
-                ('action', '=', 'approved'),
-                '|',
-                ('purchase_order_id', '=', record.id),
-                ('sale_order_id', '=', record.id)
+                ('action', '=', 'approved')
             ])
 
             approver_ids = approved_history.mapped('user_id.id')
-            return all(approver.id in approver_ids for approver in required_approvers)
+            return all(approver.user_id in approver_ids for approver in required_approvers)
         return True
 
 
@@ -79,11 +91,28 @@ class ResConfigSettings(models.TransientModel):
         default='both',
         config_parameter='multi_stage_approval.notification_method')
 
-    approval_escallation_days = fields.Integer(
+    approval_email_delivery = fields.Selection([
+        ('queued', 'Queued'),
+        ('immediate', 'Immediate')
+    ], string="Email Delivery",
+        default='queued',
+        config_parameter='multi_stage_approval.email_delivery',
+        help="Queued: approval emails are only enqueued during the transaction and sent "
+             "in batches by the mail queue. Immediate: emails are sent synchronously.")
+
+    approval_escalation_days = fields.Integer(
         string="Escalation Days",
         default=2,
-        config_parameter='multi_stage_approval.escallation_days',
-        help="Number of days before escalating pending approvals"
+        config_parameter='multi_stage_approval.escalation_days',
+        help="Number of working days before escalating pending approvals"
+    )
+
+    approval_history_archive_days = fields.Integer(
+        string="Archive History After (Days)",
+        config_parameter='multi_stage_approval.history_archive_days',
+        help="Compress the approval history of approved or rejected orders once it is older "
+             "than this many days. Leave empty or 0 to keep the history in place. The "
+             "archival scheduled action must also be activated."
     )
 
     approval_allow_override = fields.Boolean(
@@ -93,8 +122,13 @@ class ResConfigSettings(models.TransientModel):
     )
 
     def set_values(self):
+        escalation_days = self.env['approval.settings']._get_settings().escalation_days
         super(ResConfigSettings, self).set_values()
-        # Additional configuration logic if needed
+        # Drop the cached approval settings snapshot
+        self.env.registry.clear_cache()
+        # Waiting orders escalate on the new default delay
+        if self.env['approval.settings']._get_settings().escalation_days != escalation_days:
+            self.env['approval.notification.system']._recompute_escalation_dates()
         return True
 
     @api.model
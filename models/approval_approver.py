@@ -0,0 +1,89 @@
+from collections import defaultdict, namedtuple
+
+from odoo import models, api, tools
+
+# What every notification and activity path needs to know about an approver
+ApproverInfo = namedtuple('ApproverInfo', ['user_id', 'partner_id', 'email', 'lang'])
+
+# res.users fields that change who is an approver or how they are reached
+APPROVER_USER_FIELDS = {'groups_id', 'active', 'email', 'lang', 'partner_id'}
+
+
+class ApprovalApproverResolver(models.AbstractModel):
+    _name = 'approval.approver.resolver'
+    _description = 'Approval Approver Resolver'
+
+    @api.model
+    @tools.ormcache('group_id')
+    def _get_group_approvers(self, group_id):
+        """Return the ApproverInfo of all active members of a group
+
+        Cached per worker and dropped whenever group membership, implied
+        groups or an approver's contact details change.
+        """
+        if not group_id:
+            return ()
+        users = self.env['res.users'].sudo().with_context(active_test=True).search([('groups_id', 'in', [group_id])])
+        return tuple(
+            ApproverInfo(user.id, user.partner_id.id, user.email or False, user.lang)
+            for user in users
+        )
+
+    @api.model
+    def _get_approvers(self, group, exclude_user=None):
+        """Return the ApproverInfo of a group, without exclude_user if given"""
+        approvers = self._get_group_approvers(group.id)
+        if exclude_user:
+            return [approver for approver in approvers if approver.user_id != exclude_user.id]
+        return list(approvers)
+
+    @api.model
+    def _get_email_recipients_by_lang(self, approvers):
+        """Group the partners of approvers having an email address by language"""
+        recipients = defaultdict(list)
+        for approver in approvers:
+            if approver.email:
+                recipients[approver.lang].append(approver.partner_id)
+        return dict(recipients)
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        users = super(ResUsers, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return users
+
+    def write(self, vals):
+        res = super(ResUsers, self).write(vals)
+        if APPROVER_USER_FIELDS.intersection(vals) or any(
+                key.startswith(('in_group_', 'sel_groups_')) for key in vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(ResUsers, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+
+class ResGroups(models.Model):
+    _inherit = 'res.groups'
+
+    def write(self, vals):
+        res = super(ResGroups, self).write(vals)
+        if 'implied_ids' in vals or 'users' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def write(self, vals):
+        res = super(ResPartner, self).write(vals)
+        if ('email' in vals or 'lang' in vals) and self.sudo().user_ids:
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,204 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from odoo import models, fields, api, tools
+
+# Working days of a calendar expanded over a window around today: the
+# ordinals of the working dates in [first_ordinal, last_ordinal] and the
+# weekdays worked, used to count past the edges of the window
+WorkingDayTable = namedtuple('WorkingDayTable', ['first_ordinal', 'last_ordinal', 'working_ordinals', 'weekdays'])
+
+# Days of the window before and after the day the table is built
+WORKING_DAY_TABLE_PAST = 366
+WORKING_DAY_TABLE_FUTURE = 731
+
+
+class ApprovalWorkingCalendar(models.AbstractModel):
+    _name = 'approval.working.calendar'
+    _description = 'Approval Working Calendar'
+
+    @api.model
+    @tools.ormcache('calendar_id')
+    def _get_working_day_table(self, calendar_id):
+        """Expand a resource calendar into a WorkingDayTable
+
+        Weekdays without attendance and the days covered by public
+        holidays are not working days: the global leaves (without resource)
+        of the calendar and those of its company set on no calendar.
+        Cached per worker and dropped whenever the calendar, its
+        attendances or a global leave change.
+        """
+        calendar = self.env['resource.calendar'].sudo().browse(calendar_id)
+        weekdays = frozenset(
+            int(attendance.dayofweek) for attendance in calendar.attendance_ids
+            if attendance.display_type != 'line_section'
+        )
+        today = fields.Date.today()
+        first_ordinal = (today - timedelta(days=WORKING_DAY_TABLE_PAST)).toordinal()
+        last_ordinal = (today + timedelta(days=WORKING_DAY_TABLE_FUTURE)).toordinal()
+
+        tz = pytz.timezone(calendar.tz or 'UTC')
+        holidays = set()
+        leaves = self.env['resource.calendar.leaves'].sudo().search([
+            ('resource_id', '=', False),
+            '|', ('calendar_id', '=', calendar.id),
+            '&', ('calendar_id', '=', False), ('company_id', 'in', [calendar.company_id.id, False]),
+        ])
+        for leave in leaves:
+            leave_start = pytz.utc.localize(leave.date_from).astimezone(tz).date().toordinal()
+            leave_stop = pytz.utc.localize(leave.date_to).astimezone(tz).date().toordinal()
+            holidays.update(range(max(leave_start, first_ordinal), min(leave_stop, last_ordinal) + 1))
+
+        working_ordinals = tuple(
+            ordinal for ordinal in range(first_ordinal, last_ordinal + 1)
+            if date.fromordinal(ordinal).weekday() in weekdays and ordinal not in holidays
+        )
+        return WorkingDayTable(first_ordinal, last_ordinal, working_ordinals, weekdays)
+
+    @api.model
+    def _add_working_days(self, company, start, days):
+        """Return the datetime days working days after start
+
+        Days are counted on the working calendar of company, in its
+        timezone, and the local time of day of start is kept. start and the
+        result are naive UTC datetimes. Without a calendar, or with a
+        calendar without any working day, days are calendar days.
+        """
+        calendar = company.resource_calendar_id
+        if not start or not days or not calendar:
+            return start and fields.Datetime.add(start, days=days)
+        table = self._get_working_day_table(calendar.id)
+        if not table.weekdays:
+            return fields.Datetime.add(start, days=days)
+
+        tz = pytz.timezone(calendar.tz or 'UTC')
+        local_start = pytz.utc.localize(start).astimezone(tz)
+        ordinal = local_start.date().toordinal()
+        if table.first_ordinal <= ordinal < table.last_ordinal:
+            index = bisect_right(table.working_ordinals, ordinal) + days - 1
+            if index < len(table.working_ordinals):
+                return self._to_utc(tz, table.working_ordinals[index], local_start)
+            days -= len(table.working_ordinals) - bisect_right(table.working_ordinals, ordinal)
+            ordinal = table.last_ordinal
+
+        # Outside of the window only the weekly pattern is known
+        while days:
+            ordinal += 1
+            if date.fromordinal(ordinal).weekday() in table.weekdays:
+                days -= 1
+        return self._to_utc(tz, ordinal, local_start)
+
+    @api.model
+    def _to_utc(self, tz, ordinal, local_start):
+        """Return the naive UTC datetime of the day ordinal in tz at the time of day of local_start"""
+        local = tz.localize(datetime.combine(date.fromordinal(ordinal), local_start.time()))
+        return local.astimezone(pytz.utc).replace(tzinfo=None)
+
+    @api.model
+    def _on_calendars_changed(self, calendars):
+        """Drop the cached working day tables and reschedule the orders counting on calendars
+
+        The escalation deadlines already stored on the waiting orders of the
+        companies working on calendars are recomputed.
+        """
+        self.env.registry.clear_cache()
+        if calendars:
+            self.env['approval.notification.system'].sudo()._recompute_escalation_dates(
+                [('company_id.resource_calendar_id', 'in', calendars.ids)]
+            )
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    def write(self, vals):
+        res = super(ResCompany, self).write(vals)
+        # Orders waiting approval in the companies count on the new calendar
+        if 'resource_calendar_id' in vals:
+            self.env['approval.notification.system'].sudo()._recompute_escalation_dates([('company_id', 'in', self.ids)])
+        return res
+
+
+class ResourceCalendar(models.Model):
+    _inherit = 'resource.calendar'
+
+    def write(self, vals):
+        res = super(ResourceCalendar, self).write(vals)
+        if any(field in vals for field in ('tz', 'company_id')):
+            self.env['approval.working.calendar']._on_calendars_changed(self)
+        else:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(ResourceCalendar, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = 'resource.calendar.attendance'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attendances = super(ResourceCalendarAttendance, self).create(vals_list)
+        self.env['approval.working.calendar']._on_calendars_changed(attendances.calendar_id)
+        return attendances
+
+    def write(self, vals):
+        calendars = self.calendar_id
+        res = super(ResourceCalendarAttendance, self).write(vals)
+        self.env['approval.working.calendar']._on_calendars_changed(calendars | self.calendar_id)
+        return res
+
+    def unlink(self):
+        calendars = self.calendar_id
+        res = super(ResourceCalendarAttendance, self).unlink()
+        self.env['approval.working.calendar']._on_calendars_changed(calendars.exists())
+        return res
+
+
+class ResourceCalendarLeaves(models.Model):
+    _inherit = 'resource.calendar.leaves'
+
+    # Only global leaves (without resource) shape the working day tables, so
+    # personal time off does not drop the caches of the registry
+
+    def _get_approval_calendars(self):
+        """Return the calendars whose working day tables the global leaves of self shape"""
+        leaves = self.filtered(lambda leave: not leave.resource_id)
+        Calendar = self.env['resource.calendar'].sudo()
+        calendars = leaves.calendar_id
+        # Leaves set on no calendar count for every calendar of their company
+        company_leaves = leaves.filtered(lambda leave: not leave.calendar_id)
+        if any(not leave.company_id for leave in company_leaves):
+            calendars |= Calendar.search([])
+        elif company_leaves:
+            calendars |= Calendar.search([('company_id', 'in', company_leaves.company_id.ids)])
+        return calendars
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        leaves = super(ResourceCalendarLeaves, self).create(vals_list)
+        if any(not leave.resource_id for leave in leaves):
+            self.env['approval.working.calendar']._on_calendars_changed(leaves._get_approval_calendars())
+        return leaves
+
+    def write(self, vals):
+        was_global = any(not leave.resource_id for leave in self)
+        calendars = self._get_approval_calendars()
+        res = super(ResourceCalendarLeaves, self).write(vals)
+        if was_global or any(not leave.resource_id for leave in self):
+            self.env['approval.working.calendar']._on_calendars_changed(calendars | self._get_approval_calendars())
+        return res
+
+    def unlink(self):
+        was_global = any(not leave.resource_id for leave in self)
+        calendars = self._get_approval_calendars()
+        res = super(ResourceCalendarLeaves, self).unlink()
+        if was_global:
+            self.env['approval.working.calendar']._on_calendars_changed(calendars.exists())
+        return res
@@ -0,0 +1,278 @@
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+# Context key carrying the approval stage the client showed when approving
+EXPECTED_STAGE_CONTEXT_KEY = 'approval_expected_stage_id'
+
+
+class ApprovalEngine(models.AbstractModel):
+    _name = 'approval.engine'
+    _description = 'Approval Transition Engine'
+
+    @api.model
+    def _raise_order_errors(self, errors):
+        """Report the per-order validation errors collected by a batch"""
+        if len(errors) == 1:
+            raise UserError(errors[0][1])
+        raise UserError(_("The approval action failed for the following orders:\n%s") % "\n".join(
+            "- %s: %s" % (order.display_name, message) for order, message in errors
+        ))
+
+    @api.model
+    def _lock_orders(self, orders):
+        """Lock orders for a transition and reload their approval state
+
+        The lock fails right away when another transaction holds one of the
+        orders, and re-locking a row changed since the transaction started
+        raises a serialization failure. The RPC layer retries both a
+        bounded number of times; the retry validates the committed state.
+        """
+        if not orders:
+            return
+        orders.flush_recordset()
+        # NO KEY UPDATE still lets other transactions insert rows referencing the orders
+        self.env.cr.execute(SQL(
+            "SELECT id FROM %s WHERE id IN %s ORDER BY id FOR NO KEY UPDATE NOWAIT",
+            SQL.identifier(orders._table), tuple(orders.ids),
+        ))
+        orders.invalidate_recordset()
+
+    @api.model
+    def _schedule_approval_activities(self, orders, user_ids, summary, notes):
+        """Create the approval activities of orders for users in one create
+
+        notes maps each order id to the note of its activities; without a
+        summary the one of the approval activity type is used.
+        """
+        activity_type = self.env.ref('multi_stage_approval.mail_activity_approval', raise_if_not_found=False)
+        if not activity_type or not orders or not user_ids:
+            return self.env['mail.activity']
+
+        date_deadline = fields.Date.context_today(self) + relativedelta(
+            **{activity_type.delay_unit or 'days': activity_type.delay_count}
+        )
+        res_model_id = self.env['ir.model']._get_id(orders._name)
+        return self.env['mail.activity'].create([{
+            'activity_type_id': activity_type.id,
+            'res_model_id': res_model_id,
+            'res_id': order.id,
+            'user_id': user_id,
+            'summary': summary or activity_type.summary,
+            'note': notes[order.id],
+            'date_deadline': date_deadline,
+            'automated': True,
+        } for order in orders for user_id in user_ids])
+
+    @api.model
+    def _close_approval_activities(self, orders, user=None):
+        """Remove the pending approval activities of orders leaving their stage
+
+        With a user, only the activities assigned to that user are removed.
+        """
+        activity_type = self.env.ref('multi_stage_approval.mail_activity_approval', raise_if_not_found=False)
+        if not activity_type or not orders:
+            return
+        domain = [
+            ('res_model', '=', orders._name),
+            ('res_id', 'in', orders.ids),
+            ('activity_type_id', '=', activity_type.id),
+        ]
+        if user:
+            domain.append(('user_id', '=', user.id))
+        self.env['mail.activity'].sudo().search(domain).unlink()
+
+    @api.model
+    def _request_approval(self, orders):
+        """Move a recordset of draft orders into their first approval stage
+
+        Orders are validated one by one and every failure is reported
+        together. Valid orders are then grouped by (flow, stage path): each
+        group costs a single write and one notification fan-out for its
+        first stage, and the history rows of the whole batch are created
+        in one call.
+        """
+        self._lock_orders(orders)
+        Stage = self.env['approval.stage']
+        routing = self.env['approval.flow']._get_routing_table()
+
+        errors = []
+        stage_paths = {}
+        groups = defaultdict(lambda: orders.browse())
+        for order in orders:
+            try:
+                flow = order._get_approval_request_flow(routing)
+                if flow.id not in stage_paths:
+                    stage_paths[flow.id] = tuple(flow._get_stage_path())
+                if not stage_paths[flow.id]:
+                    raise UserError(_("No approval stages configured in the flow."))
+            except UserError as e:
+                errors.append((order, e.args[0]))
+                continue
+            groups[(flow.id, stage_paths[flow.id])] |= order
+
+        if errors:
+            self._raise_order_errors(errors)
+
+        history_vals = []
+        for (flow_id, stage_path), group_orders in groups.items():
+            first_stage = Stage.browse(stage_path[0])
+            group_orders.write({
+                'approval_flow_id': flow_id,
+                'approval_stage_id': first_stage.id,
+                'approval_status': 'waiting',
+                'approval_stage_path': ','.join(str(stage_id) for stage_id in stage_path),
+                'approval_stage_position': 0,
+            })
+            history_vals += [
+                order._prepare_approval_history_vals(first_stage, 'requested')
+                for order in group_orders
+            ]
+            self.env['approval.parallel.tally']._open_tallies(group_orders, first_stage)
+
+        # Create approval history records for the whole batch; the
+        # request message below is the only chatter entry per order
+        self.env['approval.history'].with_context(approval_history_silent=True).create(history_vals)
+
+        for (flow_id, stage_path), group_orders in groups.items():
+            first_stage = Stage.browse(stage_path[0])
+            for order in group_orders:
+                order.message_post(
+                    body=_("Approval requested by %s. Current Stage: %s") % (self.env.user.name, first_stage.name),
+                    subtype_xmlid='mail.mt_comment'
+                )
+
+            # Notify and schedule activities once per stage
+            group_orders._send_approval_notifications(first_stage)
+            group_orders._create_approval_activity(group_orders, first_stage)
+
+        # Wake the mail queue once for the emails of every stage
+        if groups:
+            self.env['approval.notification.system']._flush_mail_queue()
+
+    @api.model
+    def _approve(self, orders):
+        """Approve the current stage of a recordset of orders
+
+        Orders are split by current stage so approval rights are checked
+        once per stage, then by target stage so advancing orders cost one
+        write and one notification fan-out per target. Orders at a
+        parallel stage only move on once their tally is complete, and an
+        approval their tally does not count is refused. Fully
+        approved orders are completed and confirmed together.
+
+        With an approval_expected_stage_id context key, orders that left
+        that stage since the client loaded them are refused, so a retried
+        or concurrent click never approves the stage that followed.
+        """
+        self._lock_orders(orders)
+        expected_stage_id = self.env.context.get(EXPECTED_STAGE_CONTEXT_KEY)
+        errors = []
+        by_stage = defaultdict(lambda: orders.browse())
+        for order in orders:
+            if order.approval_status != 'waiting':
+                errors.append((order, _("Only orders waiting approval can be approved.")))
+                continue
+            if expected_stage_id and order.approval_stage_id.id != expected_stage_id:
+                errors.append((order, _("This order already moved to another approval stage; "
+                                        "reload it before approving.")))
+                continue
+            by_stage[order.approval_stage_id] |= order
+
+        for stage_orders in by_stage.values():
+            if not stage_orders._check_approval_rights(stage_orders[0]):
+                errors += [
+                    (order, _("You don't have permission to approve this stage."))
+                    for order in stage_orders
+                ]
+
+        if errors:
+            self._raise_order_errors(errors)
+
+        # Parallel stages wait until every required approver approved
+        Tally = self.env['approval.parallel.tally']
+        pending_tallies = counted_tallies = Tally.browse()
+        for stage, stage_orders in by_stage.items():
+            if stage.approval_type == 'parallel':
+                stage_pending, stage_counted = Tally._record_approvals(stage_orders, stage, self.env.user)
+                pending_tallies |= stage_pending
+                counted_tallies |= stage_counted
+        pending = orders.browse(pending_tallies.mapped('res_id'))
+
+        # Approvals the tallies did not count are refused
+        for tally in pending_tallies - counted_tallies:
+            if self.env.user in tally.approved_user_ids:
+                message = _("You already approved this stage.")
+            else:
+                message = _("You are not among the approvers required for this stage.")
+            errors.append((orders.browse(tally.res_id), message))
+        if errors:
+            self._raise_order_errors(errors)
+
+        self.env['approval.history'].with_context(approval_history_silent=True).create([
+            order._prepare_approval_history_vals(order.approval_stage_id, 'approved', 'Approved via button')
+            for order in orders
+        ])
+        for tally in pending_tallies:
+            orders.browse(tally.res_id).message_post(
+                body=_("Approved by %s (%s/%s)") % (self.env.user.name, tally.approval_count, tally.required_count),
+                subtype_xmlid='mail.mt_comment'
+            )
+        self._close_approval_activities(pending, user=self.env.user)
+
+        # The current stage is done for every other order of the batch
+        orders -= pending
+        self._close_approval_activities(orders)
+
+        # Move to next stage or complete approval
+        advancing = defaultdict(lambda: orders.browse())
+        completed = orders.browse()
+        for order in orders:
+            next_stage = order._get_next_stage(order)
+            if next_stage:
+                advancing[(next_stage, order.approval_stage_position + 1)] |= order
+            else:
+                completed |= order
+
+        by_next_stage = defaultdict(lambda: orders.browse())
+        for (next_stage, position), group_orders in advancing.items():
+            group_orders.write({
+                'approval_stage_id': next_stage.id,
+                'approval_stage_position': position,
+            })
+            by_next_stage[next_stage] |= group_orders
+
+        for next_stage, group_orders in by_next_stage.items():
+            Tally._open_tallies(group_orders, next_stage)
+            group_orders._on_approval_stage_advanced(next_stage)
+        if by_next_stage:
+            self.env['approval.notification.system']._flush_mail_queue()
+
+        if completed:
+            completed.write({'approval_status': 'approved'})
+            completed._on_approval_completed()
+
+    @api.model
+    def _reject(self, orders):
+        """Reject a recordset of orders waiting approval in one pass"""
+        self._lock_orders(orders)
+        errors = [
+            (order, _("Only orders waiting approval can be rejected."))
+            for order in orders if order.approval_status != 'waiting'
+        ]
+        if errors:
+            self._raise_order_errors(errors)
+
+        # Create rejection history for the whole batch
+        self.env['approval.history'].with_context(approval_history_silent=True).create([
+            order._prepare_approval_history_vals(order.approval_stage_id, 'rejected', 'Rejected via button')
+            for order in orders
+        ])
+
+        orders.write({'approval_status': 'rejected'})
+        self._close_approval_activities(orders)
+        orders._on_approval_rejected()
@@ -1,6 +1,52 @@
-from odoo import models,fields, api
+from bisect import bisect_left
+from collections import namedtuple
+
+from odoo import models,fields, api, tools
 from odoo.tools import unique
 
+# Compiled view of one active flow: its id, the ordered stage ids, the
+# (stage_id, minimum_amount, maximum_amount) band of every stage and an
+# AmountBandIndex over those bands.
+FlowRoute = namedtuple('FlowRoute', ['flow_id', 'stage_ids', 'bands', 'band_index'])
+
+
+class AmountBandIndex(object):
+    """Sorted interval index answering "which stages cover this amount".
+
+    Bands are inclusive on both ends and a maximum of 0 means open-ended,
+    like the amount ranges on approval.stage. The distinct band bounds
+    split the amount axis into elementary slots (each bound itself and the
+    open gaps between them); the covering stages of every slot are
+    precomputed, so a lookup is a single bisect.
+    """
+
+    def __init__(self, bands):
+        intervals = [
+            (stage_id, minimum, maximum or float('inf'))
+            for stage_id, minimum, maximum in bands
+        ]
+        self._points = sorted(
+            {lo for _sid, lo, _hi in intervals}
+            | {hi for _sid, _lo, hi in intervals if hi != float('inf')}
+        )
+        bounds = [float('-inf')] + self._points + [float('inf')]
+        slots = []
+        for i, point in enumerate(self._points):
+            # Open gap below the point, then the point itself
+            gap_lo, gap_hi = bounds[i], point
+            slots.append(tuple(sid for sid, lo, hi in intervals if lo <= gap_lo and hi >= gap_hi))
+            slots.append(tuple(sid for sid, lo, hi in intervals if lo <= point <= hi))
+        slots.append(tuple(sid for sid, lo, hi in intervals if lo <= bounds[-2] and hi == float('inf')))
+        self._slots = tuple(slots)
+
+    def lookup(self, amount):
+        """Return the ids of the stages whose band contains amount"""
+        i = bisect_left(self._points, amount)
+        if i < len(self._points) and self._points[i] == amount:
+            return self._slots[2 * i + 1]
+        return self._slots[2 * i]
+
+
 class ApprovalFlow(models.Model):
     _name = 'approval.flow'
     _description = 'Approval Flow'
@@ -19,3 +65,58 @@ class ApprovalFlow(models.Model):
     _sql_constraints = [
         ('unique_flow_model', 'unique(model, company_id)','Only one flow per model per company is allowed!')
     ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        flows = super(ApprovalFlow, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return flows
+
+    def write(self, vals):
+        res = super(ApprovalFlow, self).write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(ApprovalFlow, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_routing_table(self):
+        """Compile active flows into a {(model, company_id): FlowRoute} table.
+
+        Built once per worker and dropped whenever a flow or a stage is
+        written, so computing approval requirements on a whole recordset
+        never has to search flows again. The returned dict is shared and
+        must not be modified.
+        """
+        table = {}
+        for flow in self.sudo().with_context(active_test=True).search([]):
+            key = (flow.model, flow.company_id.id)
+            if key in table:
+                # Same precedence as search(..., limit=1) on the flow order
+                continue
+            stages = flow.stage_ids.sorted(lambda s: (s.sequence, s.id))
+            bands = tuple((s.id, s.minimum_amount, s.maximum_amount) for s in stages)
+            table[key] = FlowRoute(
+                flow_id=flow.id,
+                stage_ids=tuple(stages.ids),
+                bands=bands,
+                band_index=AmountBandIndex(bands),
+            )
+        return table
+
+    @api.model
+    def _get_route(self, model_name, company_id):
+        """Return the FlowRoute for a model and company, or None"""
+        return self._get_routing_table().get((model_name, company_id or False))
+
+    def _get_stage_path(self):
+        """Return the ordered stage ids of the flow, from the routing table when possible"""
+        self.ensure_one()
+        route = self._get_route(self.model, self.company_id.id)
+        if route and route.flow_id == self.id:
+            return list(route.stage_ids)
+        return self.stage_ids.sorted(lambda s: (s.sequence, s.id)).ids
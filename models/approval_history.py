@@ -1,4 +1,13 @@
-from odoo import models, fields, api
+import base64
+import json
+import zlib
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+ARCHIVE_MODELS = ('purchase.order', 'sale.order')
+ARCHIVE_CHUNK_SIZE = 500
 
 
 class ApprovalHistory(models.Model):
@@ -17,6 +26,34 @@ class ApprovalHistory(models.Model):
     user_id = fields.Many2one('res.users', string='User', required=True)
     note = fields.Text(string='Notes')
     date = fields.Datetime(string='Date', default=fields.Datetime.now)
+    # Document of the row whatever its model, for single index lookups
+    res_model = fields.Char(string='Document Model', compute='_compute_res_reference', store=True)
+    res_id = fields.Many2oneReference(string='Document ID', model_field='res_model',
+                                      compute='_compute_res_reference', store=True)
+
+    def init(self):
+        super(ApprovalHistory, self).init()
+        # History of one document in date order (one2many loads, reports)
+        tools.create_index(self._cr, 'approval_history_purchase_order_date_index', self._table,
+                           ['purchase_order_id', 'date'], where='purchase_order_id IS NOT NULL')
+        tools.create_index(self._cr, 'approval_history_sale_order_date_index', self._table,
+                           ['sale_order_id', 'date'], where='sale_order_id IS NOT NULL')
+        # Rows of one document, optionally at a stage and for an action
+        tools.create_index(self._cr, 'approval_history_res_reference_index', self._table,
+                           ['res_model', 'res_id', 'stage_id', 'action'])
+        # Approvals given at a stage across documents
+        tools.create_index(self._cr, 'approval_history_stage_action_index', self._table,
+                           ['stage_id', 'action'])
+        # Date ranges of the reports; rows are inserted in date order
+        tools.create_index(self._cr, 'approval_history_date_brin_index', self._table,
+                           ['date'], method='brin')
+
+    @api.depends('purchase_order_id', 'sale_order_id')
+    def _compute_res_reference(self):
+        for record in self:
+            document = record.purchase_order_id or record.sale_order_id
+            record.res_model = document._name if document else False
+            record.res_id = document.id
 
     def name_get(self):
         result = []
@@ -25,19 +62,120 @@ class ApprovalHistory(models.Model):
             result.append((record.id, name))
         return result
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Create history rows in one batch and log them on their documents
+
+        Each document gets at most one chatter message for the rows of a
+        batch. Transitions run by the approval engine post their own
+        message and pass the approval_history_silent context key instead.
+        """
+        records = super(ApprovalHistory, self).create(vals_list)
+        if not self.env.context.get('approval_history_silent'):
+            records._post_history_messages()
+        return records
+
+    def _post_history_messages(self):
+        """Post one message per linked document listing its history rows"""
+        rows_by_document = defaultdict(list)
+        for record in self:
+            document = record.purchase_order_id or record.sale_order_id
+            if document:
+                rows_by_document[document].append(f"Approval {record.action}: {record.stage_id.name}")
+        for document, rows in rows_by_document.items():
+            document.message_post(body="; ".join(rows))
+
+
+class ApprovalHistoryArchive(models.Model):
+    _name = 'approval.history.archive'
+    _description = 'Approval History Archive'
+    _order = 'last_date desc'
+
+    res_model = fields.Char(string='Document Model', required=True, readonly=True)
+    res_id = fields.Many2oneReference(string='Document ID', model_field='res_model', required=True, readonly=True)
+    row_count = fields.Integer(string='Archived Rows', readonly=True)
+    first_date = fields.Datetime(string='First Action', readonly=True)
+    last_date = fields.Datetime(string='Last Action', readonly=True)
+    history_data = fields.Binary(string='Compressed History', attachment=False, readonly=True)
+
+    def init(self):
+        super(ApprovalHistoryArchive, self).init()
+        tools.create_index(self._cr, 'approval_history_archive_res_reference_index', self._table,
+                           ['res_model', 'res_id'])
+
+    def _get_history_rows(self):
+        """Return the archived history rows of the document as dicts"""
+        self.ensure_one()
+        return json.loads(zlib.decompress(base64.b64decode(self.history_data)))
+
+    @api.model
+    def _cron_archive_history(self):
+        """Scheduled entry point: commit after every chunk of documents"""
+        self._archive_closed_history(auto_commit=True)
+
+    @api.model
+    def _archive_closed_history(self, chunk_size=ARCHIVE_CHUNK_SIZE, auto_commit=False):
+        """Move the history of long-closed orders into compressed archives
+
+        Orders that are approved or rejected and whose last history row is
+        older than the configured number of days get one archive record
+        holding all their rows, which are then deleted. Returns the number
+        of archived documents.
+        """
+        archive_days = self.env['approval.settings']._get_settings().history_archive_days
+        if not archive_days:
+            return 0
+        cutoff = fields.Datetime.subtract(fields.Datetime.now(), days=archive_days)
+        History = self.env['approval.history'].sudo()
+
+        archived = 0
+        for model_name in ARCHIVE_MODELS:
+            # Select the candidates once, then archive them chunk by chunk
+            self.env.cr.execute(SQL("""
+                SELECT history.res_id
+                  FROM approval_history history
+                  JOIN %s document ON document.id = history.res_id
+                 WHERE history.res_model = %s
+                   AND document.approval_status IN ('approved', 'rejected')
+              GROUP BY history.res_id
+                HAVING max(history.date) < %s
+              ORDER BY history.res_id
+            """, SQL.identifier(self.env[model_name]._table), model_name, cutoff))
+            candidate_ids = [res_id for res_id, in self.env.cr.fetchall()]
+
+            for start in range(0, len(candidate_ids), chunk_size):
+                res_ids = candidate_ids[start:start + chunk_size]
+                rows = History.search([('res_model', '=', model_name), ('res_id', 'in', res_ids)], order='date, id')
+                rows_by_document = defaultdict(list)
+                for row in rows:
+                    rows_by_document[row.res_id].append(row)
+                self.sudo().create([
+                    self._prepare_archive_vals(model_name, res_id, document_rows)
+                    for res_id, document_rows in rows_by_document.items()
+                ])
+                rows.unlink()
+
+                archived += len(rows_by_document)
+                if auto_commit:
+                    self.env.cr.commit()
+                self.env.invalidate_all()
+        return archived
+
     @api.model
-    def create(self, vals):
-        """Override create to ensure proper record linking"""
-        record = super(ApprovalHistory, self).create(vals)
-
-        # Post message to linked document
-        if record.purchase_order_id:
-            record.purchase_order_id.message_post(
-                body=f"Approval {record.action}: {record.stage_id.name}"
-            )
-        elif record.sale_order_id:
-            record.sale_order_id.message_post(
-                body=f"Approval {record.action}: {record.stage_id.name}"
-            )
-
-        return record
\ No newline at end of file
+    def _prepare_archive_vals(self, model_name, res_id, rows):
+        """Return the archive values of the history rows of one document"""
+        data = [{
+            'stage': row.stage_id.name,
+            'action': row.action,
+            'user': row.user_id.name,
+            'date': fields.Datetime.to_string(row.date),
+            'note': row.note or '',
+        } for row in rows]
+        return {
+            'res_model': model_name,
+            'res_id': res_id,
+            'row_count': len(rows),
+            'first_date': rows[0].date,
+            'last_date': rows[-1].date,
+            'history_data': base64.b64encode(zlib.compress(json.dumps(data).encode())),
+        }
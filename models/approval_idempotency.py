@@ -0,0 +1,78 @@
+import json
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+# Hours a key keeps replaying the result of its first call
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_CONTEXT_KEY = 'approval_idempotency_key'
+
+
+class ApprovalIdempotencyKey(models.Model):
+    _name = 'approval.idempotency.key'
+    _description = 'Approval Idempotency Key'
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+    action = fields.Char(string='Action', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='User', required=True, ondelete='cascade', readonly=True)
+    res_model = fields.Char(string='Document Model', readonly=True)
+    res_ids = fields.Char(string='Document IDs', readonly=True)
+    result = fields.Text(string='Result', readonly=True)
+    expires_at = fields.Datetime(string='Expires On', required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        ('key_unique', 'unique(user_id, action, key)',
+         'An idempotency key can only be used once per user and action.'),
+    ]
+
+    @api.model
+    def _run_once(self, records, action, key, func):
+        """Run func for an approval action on records once per idempotency key
+
+        The key comes from the argument or the approval_idempotency_key
+        context key; without one func simply runs. The first call with a
+        key claims it and stores the result of func, and replays of the key
+        until it expires return that result without running func again. A
+        replay racing the first call waits for it and, once it committed,
+        fails with a serialization error that the RPC layer retries.
+        """
+        key = key or self.env.context.get(IDEMPOTENCY_CONTEXT_KEY)
+        if not key:
+            return func()
+
+        res_ids = ','.join(str(res_id) for res_id in sorted(records.ids))
+        now = fields.Datetime.now()
+        # Claim the key, or take it over once it expired
+        self.env.cr.execute(SQL("""
+            INSERT INTO approval_idempotency_key
+                        (key, action, user_id, res_model, res_ids, expires_at,
+                         create_uid, create_date, write_uid, write_date)
+                 VALUES (%(key)s, %(action)s, %(uid)s, %(model)s, %(res_ids)s, %(expires_at)s,
+                         %(uid)s, %(now)s, %(uid)s, %(now)s)
+            ON CONFLICT (user_id, action, key) DO UPDATE
+                    SET res_model = EXCLUDED.res_model, res_ids = EXCLUDED.res_ids, result = NULL,
+                        expires_at = EXCLUDED.expires_at, write_date = EXCLUDED.write_date
+                  WHERE approval_idempotency_key.expires_at < %(now)s
+              RETURNING id
+        """, key=key, action=action, uid=self.env.uid, model=records._name, res_ids=res_ids,
+            expires_at=fields.Datetime.add(now, hours=IDEMPOTENCY_KEY_TTL_HOURS), now=now))
+        claimed = self.env.cr.fetchone()
+        if claimed:
+            result = func()
+            self.sudo().browse(claimed[0]).write({'result': json.dumps(result)})
+            return result
+
+        stored = self.sudo().search([
+            ('user_id', '=', self.env.uid),
+            ('action', '=', action),
+            ('key', '=', key),
+        ])
+        if (stored.res_model, stored.res_ids) != (records._name, res_ids):
+            raise UserError(_("This idempotency key was already used for other records."))
+        return json.loads(stored.result or 'null')
+
+    @api.model
+    def _cron_prune_expired(self):
+        """Delete the idempotency keys past their time to live"""
+        self.sudo().search([('expires_at', '<', fields.Datetime.now())]).unlink()
@@ -2,6 +2,9 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from datetime import datetime, timedelta
 
+# Orders listed per model in the summary report, latest first
+REPORT_DETAIL_LIMIT = 200
+
 
 class ApprovalReports(models.AbstractModel):
     _name = 'report.multi_stage_approval.report_approval_summary'
@@ -25,19 +28,19 @@ class ApprovalReports(models.AbstractModel):
             ('approval_history_ids.date', '<=', date_to)
         ]
 
-        # Get purchase orders
-        purchase_orders = self.env['purchase.order'].search(domain)
-
-        # Get sales orders
-        sales_orders = self.env['sale.order'].search(domain)
-
-        # Categorize orders by status
-        all_orders = list(purchase_orders) + list(sales_orders)
+        # Count orders per approval status in the database
+        status_counts = dict.fromkeys(('draft', 'waiting', 'approved', 'rejected'), 0)
+        order_counts = {}
+        for model_name in ('purchase.order', 'sale.order'):
+            order_counts[model_name] = 0
+            for status, count in self.env[model_name]._read_group(domain, ['approval_status'], ['__count']):
+                if status in status_counts:
+                    status_counts[status] += count
+                order_counts[model_name] += count
 
-        draft_orders = [o for o in all_orders if o.approval_status == 'draft']
-        waiting_orders = [o for o in all_orders if o.approval_status == 'waiting']
-        approved_orders = [o for o in all_orders if o.approval_status == 'approved']
-        rejected_orders = [o for o in all_orders if o.approval_status == 'rejected']
+        # Only fetch the orders listed in the report
+        purchase_orders = self.env['purchase.order'].search(domain, order='id desc', limit=REPORT_DETAIL_LIMIT)
+        sales_orders = self.env['sale.order'].search(domain, order='id desc', limit=REPORT_DETAIL_LIMIT)
 
         return {
             'doc_ids': docids,
@@ -45,10 +48,13 @@ class ApprovalReports(models.AbstractModel):
             'docs': self.env['approval.flow'].browse(docids),
             'purchase_orders': purchase_orders,
             'sales_orders': sales_orders,
-            'draft_orders': draft_orders,
-            'waiting_orders': waiting_orders,
-            'approved_orders': approved_orders,
-            'rejected_orders': rejected_orders,
+            'purchase_count': order_counts['purchase.order'],
+            'sales_count': order_counts['sale.order'],
+            'total_count': sum(order_counts.values()),
+            'draft_count': status_counts['draft'],
+            'waiting_count': status_counts['waiting'],
+            'approved_count': status_counts['approved'],
+            'rejected_count': status_counts['rejected'],
             'company': self.env.company,
             'date_from': date_from,
             'date_to': date_to,
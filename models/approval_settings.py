@@ -0,0 +1,34 @@
+from collections import namedtuple
+
+from odoo import models, api, tools
+
+# Typed snapshot of the approval configuration parameters
+ApprovalSettings = namedtuple('ApprovalSettings', [
+    'auto_confirm', 'notification_method', 'email_delivery', 'escalation_days', 'allow_override', 'base_url',
+    'history_archive_days',
+])
+
+
+class ApprovalSettingsSnapshot(models.AbstractModel):
+    _name = 'approval.settings'
+    _description = 'Approval Settings Snapshot'
+
+    @api.model
+    @tools.ormcache()
+    def _get_settings(self):
+        """Return the ApprovalSettings every approval code path reads
+
+        Cached per worker and dropped whenever a configuration parameter
+        changes or the approval settings are saved.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        notification_method = ICP.get_param('multi_stage_approval.notification_method', 'both')
+        return ApprovalSettings(
+            auto_confirm=bool(ICP.get_param('multi_stage_approval.auto_confirm', False)),
+            notification_method=notification_method if notification_method in ('email', 'chat') else 'both',
+            email_delivery=ICP.get_param('multi_stage_approval.email_delivery', 'queued'),
+            escalation_days=int(ICP.get_param('multi_stage_approval.escalation_days', 2)),
+            allow_override=bool(ICP.get_param('multi_stage_approval.allow_override', False)),
+            base_url=ICP.get_param('web.base.url') or '',
+            history_archive_days=int(ICP.get_param('multi_stage_approval.history_archive_days', 0)),
+        )
@@ -1,6 +1,12 @@
+import math
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+# Fields of the escalation chain of a stage
+ESCALATION_FIELDS = ('escalation_approver_days', 'escalation_manager_days',
+                     'escalation_group_days', 'escalation_group_id')
+
 class ApprovalStage(models.Model):
     _name= 'approval.stage'
     _description = 'Approval Stage'
@@ -19,10 +25,118 @@ class ApprovalStage(models.Model):
         ('optional', 'Optional Approval'),
         ('parallel', 'Parallel Approval')
     ], default='mandatory')
+    # Approvals needed to complete a parallel stage
+    quorum_type = fields.Selection([
+        ('all', 'Everyone'),
+        ('count', 'Number of Approvers'),
+        ('percentage', 'Percentage of Approvers'),
+        ('any', 'Any One')
+    ], string='Quorum', default='all', required=True)
+    quorum_count = fields.Integer(string='Approvals Required', default=1)
+    quorum_percentage = fields.Float(string='Approvals Required (%)', default=50.0)
+
+    # Escalation chain, in days after the order entered the stage
+    escalation_approver_days = fields.Integer(
+        string='Remind Approvers After (Days)',
+        help="Escalate to the stage approvers after this many days. 0 uses the default escalation days.")
+    escalation_manager_days = fields.Integer(
+        string='Escalate to Managers After (Days)',
+        help="Escalate to the Approval Managers after this many days. 0 disables this level.")
+    escalation_group_days = fields.Integer(
+        string='Escalate to Group After (Days)',
+        help="Escalate to the escalation group after this many days. 0 disables this level.")
+    escalation_group_id = fields.Many2one('res.groups', string='Escalation Group')
 
     # Constraints
     @api.constrains('minimum_amount', 'maximum_amount')
     def _check_amount_range(self):
         for stage in self:
             if stage.maximum_amount > 0 and stage.minimum_amount > stage.maximum_amount:
-                raise ValidationError("Minimum amount cannot be greater than maximum amount.")
\ No newline at end of file
+                raise ValidationError("Minimum amount cannot be greater than maximum amount.")
+
+    @api.constrains('quorum_type', 'quorum_count', 'quorum_percentage')
+    def _check_quorum(self):
+        for stage in self:
+            if stage.quorum_type == 'count' and stage.quorum_count < 1:
+                raise ValidationError("A quorum needs at least one approval.")
+            if stage.quorum_type == 'percentage' and not 0 < stage.quorum_percentage <= 100:
+                raise ValidationError("The quorum percentage must be between 0 and 100.")
+
+    def _get_quorum(self, approver_count):
+        """Return how many of approver_count approvers must approve the stage"""
+        self.ensure_one()
+        if self.quorum_type == 'count':
+            return min(self.quorum_count, approver_count)
+        if self.quorum_type == 'percentage':
+            return min(math.ceil(approver_count * self.quorum_percentage / 100), approver_count)
+        if self.quorum_type == 'any':
+            return min(1, approver_count)
+        return approver_count
+
+    @api.constrains('escalation_approver_days', 'escalation_manager_days', 'escalation_group_days')
+    def _check_escalation_days(self):
+        for stage in self:
+            days = [stage.escalation_approver_days, stage.escalation_manager_days, stage.escalation_group_days]
+            if any(day < 0 for day in days):
+                raise ValidationError("Escalation days cannot be negative.")
+            enabled = [day for day in days if day]
+            if enabled != sorted(set(enabled)):
+                raise ValidationError("Each escalation level must come strictly after the previous one.")
+
+    def _get_escalation_schedule(self, default_days):
+        """Return the enabled escalation levels of the stage as [(level, days)]
+
+        Level 1 reminds the stage approvers, level 2 the Approval Managers
+        and level 3 the escalation group. Days count from stage entry.
+        """
+        self.ensure_one()
+        schedule = [(1, self.escalation_approver_days or default_days)]
+        if self.escalation_manager_days:
+            schedule.append((2, self.escalation_manager_days))
+        if self.escalation_group_days and self.escalation_group_id:
+            schedule.append((3, self.escalation_group_days))
+        return schedule
+
+    def _get_next_escalation(self, current_level, default_days):
+        """Return the (level, days) of the first escalation after current_level, or None"""
+        if not self:
+            return None
+        return next((
+            (level, days) for level, days in self._get_escalation_schedule(default_days)
+            if level > current_level
+        ), None)
+
+    def _get_escalation_recipients(self, level):
+        """Return the ApproverInfo of the audience of an escalation level"""
+        self.ensure_one()
+        if level == 1:
+            group = self.role_id
+        elif level == 2:
+            group = self.env.ref('multi_stage_approval.group_multi_stage_approval_manager', raise_if_not_found=False)
+        else:
+            group = self.escalation_group_id
+        if not group:
+            return []
+        return self.env['approval.approver.resolver']._get_approvers(group)
+
+    # Keep the compiled flow routing table in sync with stage changes
+    @api.model_create_multi
+    def create(self, vals_list):
+        stages = super(ApprovalStage, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return stages
+
+    def write(self, vals):
+        res = super(ApprovalStage, self).write(vals)
+        self.env.registry.clear_cache()
+        # Orders waiting at the stage escalate on its new chain
+        if any(field in vals for field in ESCALATION_FIELDS):
+            self.env['approval.notification.system'].sudo()._recompute_escalation_dates(
+                [('approval_stage_id', 'in', self.ids)]
+            )
+        return res
+
+    def unlink(self):
+        res = super(ApprovalStage, self).unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,107 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+
+class ApprovalParallelTally(models.Model):
+    _name = 'approval.parallel.tally'
+    _description = 'Parallel Approval Tally'
+
+    res_model = fields.Char(string='Document Model', required=True, readonly=True)
+    res_id = fields.Many2oneReference(string='Document ID', model_field='res_model', required=True, readonly=True)
+    stage_id = fields.Many2one('approval.stage', string='Approval Stage', required=True, ondelete='cascade',
+                               readonly=True)
+    required_user_ids = fields.Many2many('res.users', 'approval_parallel_tally_required_rel', 'tally_id', 'user_id',
+                                         string='Required Approvers', readonly=True)
+    approved_user_ids = fields.Many2many('res.users', 'approval_parallel_tally_approved_rel', 'tally_id', 'user_id',
+                                         string='Approved By', readonly=True)
+    required_count = fields.Integer(string='Required Approvals', readonly=True)
+    approval_count = fields.Integer(string='Approvals', readonly=True)
+
+    _sql_constraints = [
+        ('document_stage_unique', 'unique(res_model, res_id, stage_id)',
+         'A document can only have one parallel approval tally per stage.'),
+    ]
+
+    @api.model
+    def _open_tallies(self, orders, stage):
+        """Start counting the approvals of orders entering a parallel stage
+
+        The approvers counted are those of the stage group at entry and the
+        approvals required follow the quorum of the stage; later membership
+        changes do not move the target of a started tally.
+        """
+        if stage.approval_type != 'parallel' or not orders:
+            return self.browse()
+        self._get_tallies(orders, stage).unlink()
+        approvers = self.env['approval.approver.resolver']._get_approvers(stage.role_id)
+        user_ids = [approver.user_id for approver in approvers]
+        return self.sudo().create([{
+            'res_model': order._name,
+            'res_id': order.id,
+            'stage_id': stage.id,
+            'required_user_ids': [(6, 0, user_ids)],
+            'required_count': stage._get_quorum(len(user_ids)),
+        } for order in orders])
+
+    @api.model
+    def _get_tallies(self, orders, stage):
+        """Return the tallies of orders at stage"""
+        return self.sudo().search([
+            ('res_model', '=', orders._name),
+            ('res_id', 'in', orders.ids),
+            ('stage_id', '=', stage.id),
+        ])
+
+    @api.model
+    def _record_approvals(self, orders, stage, user):
+        """Count the approval of user on orders at a parallel stage
+
+        Returns a (pending, counted) pair of tallies: those of the orders
+        still waiting for other approvers, with the approvals counted so
+        far, and those the approval of user was counted on, which excludes
+        repeated approvals and users not required at stage entry. The tallies
+        are row-locked and incremented in SQL, and an order only moves on
+        in the transaction whose approval reaches the quorum, so concurrent
+        approvals never advance it twice. Orders that entered the stage
+        before tallies existed get one opened first.
+        """
+        tallies = self._get_tallies(orders, stage)
+        missing = orders.browse(set(orders.ids) - set(tallies.mapped('res_id')))
+        tallies |= self._open_tallies(missing, stage)
+        if not tallies:
+            return self.browse(), self.browse()
+
+        tallies.flush_recordset()
+        # Lock in id order so concurrent batches cannot deadlock
+        self.env.cr.execute(SQL(
+            "SELECT id FROM approval_parallel_tally WHERE id IN %s ORDER BY id FOR NO KEY UPDATE",
+            tuple(tallies.ids),
+        ))
+        tallies.invalidate_recordset()
+
+        pending = counted = self.browse()
+        for tally in tallies.sorted('id'):
+            reached = not tally.required_count
+            if user in tally.required_user_ids:
+                self.env.cr.execute(SQL("""
+                    INSERT INTO approval_parallel_tally_approved_rel (tally_id, user_id)
+                    VALUES (%s, %s) ON CONFLICT DO NOTHING
+                """, tally.id, user.id))
+                if self.env.cr.rowcount:
+                    self.env.cr.execute(SQL("""
+                        UPDATE approval_parallel_tally
+                           SET approval_count = approval_count + 1
+                         WHERE id = %s
+                     RETURNING approval_count = required_count
+                    """, tally.id))
+                    reached = self.env.cr.fetchone()[0]
+                    counted |= tally
+            if not reached:
+                pending |= tally
+        tallies.invalidate_recordset(['approved_user_ids', 'approval_count'])
+        return pending, counted
+
+    def _is_complete(self):
+        """Whether the quorum of the stage was reached"""
+        self.ensure_one()
+        return self.approval_count >= self.required_count
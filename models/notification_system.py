@@ -1,51 +1,206 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import logging
+import time
+from collections import defaultdict
 
 _logger = logging.getLogger(__name__)
 
+ESCALATION_MODELS = ('purchase.order', 'sale.order')
+ESCALATION_CHUNK_SIZE = 500
+# Seconds a scheduled run may spend before re-triggering itself
+ESCALATION_TIME_BUDGET = 600
+
+
+class ApprovalEscalationCursor(models.Model):
+    _name = 'approval.escalation.cursor'
+    _description = 'Approval Escalation Cursor'
+
+    res_model = fields.Char(string='Document Model', readonly=True)
+    last_id = fields.Integer(string='Last Document ID', readonly=True)
+
+    @api.model
+    def _get_position(self):
+        """Return the (model, id) an interrupted escalation run stopped at"""
+        cursor = self.sudo().search([], limit=1)
+        return cursor.res_model, cursor.last_id
+
+    @api.model
+    def _save_position(self, res_model, last_id):
+        """Record the last order an escalation run went through
+
+        Kept in a table of its own rather than a configuration parameter,
+        whose writes drop every ormcache of the registry.
+        """
+        cursor = self.sudo().search([], limit=1)
+        if cursor:
+            cursor.write({'res_model': res_model, 'last_id': last_id})
+        else:
+            self.sudo().create({'res_model': res_model, 'last_id': last_id})
+
+    @api.model
+    def _clear_position(self):
+        """Forget the position once a run walked every model"""
+        self.sudo().search([]).unlink()
+
 
 class ApprovalNotificationSystem(models.Model):
     _name = 'approval.notification.system'
     _description = 'Approval Notification System'
 
     @api.model
-    def check_escalations(self):
-        """Check for pending approvals that need escalation"""
-        escalation_days = int(self.env['ir.config_parameter'].sudo().get_param(
-            'multi_stage_approval.escalation_days', 2
-        ))
+    def _use_force_send(self):
+        """Whether approval emails are sent synchronously instead of queued"""
+        return self.env['approval.settings']._get_settings().email_delivery == 'immediate'
+
+    @api.model
+    def _flush_mail_queue(self):
+        """Wake the mail queue processor so queued approval emails go out soon
+
+        The processor sends outgoing mail.mail records in batches, reusing one
+        SMTP connection per mail server, after the current transaction commits.
+        Nothing to do when approval emails are sent immediately.
+        """
+        if self._use_force_send():
+            return
+        cron = self.env.ref('mail.ir_cron_mail_scheduler_action', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _get_default_escalation_days(self):
+        """Days before the first escalation of stages without their own delay"""
+        return self.env['approval.settings']._get_settings().escalation_days
 
-        # Find orders waiting approval for more than escalation days
-        domain = [
+    @api.model
+    def _recompute_escalation_dates(self, domain=None, chunk_size=ESCALATION_CHUNK_SIZE):
+        """Reschedule the escalations of waiting orders, e.g. after the default days changed
+
+        domain restricts the orders rescheduled, e.g. to those of a stage or
+        a company. Orders are walked model by model in id order, chunk_size
+        at a time, and each chunk is written and dropped from the cache
+        before the next one is loaded.
+        """
+        for model_name in ESCALATION_MODELS:
+            Order = self.env[model_name]
+            last_id = 0
+            while True:
+                orders = Order.search([('approval_status', '=', 'waiting'), ('id', '>', last_id)] + (domain or []),
+                                      order='id', limit=chunk_size)
+                if not orders:
+                    break
+                self.env.add_to_compute(orders._fields['approval_next_escalation_at'], orders)
+                orders._recompute_recordset(['approval_next_escalation_at'])
+                orders.flush_recordset(['approval_next_escalation_at'])
+                last_id = orders[-1].id
+                self.env.invalidate_all()
+
+    @api.model
+    def _cron_check_escalations(self):
+        """Scheduled entry point: commit per chunk and stay within the cron time budget"""
+        self.check_escalations(auto_commit=True, time_budget=ESCALATION_TIME_BUDGET)
+
+    @api.model
+    def _get_escalation_domain(self):
+        """Domain of the orders whose approval is overdue for escalation"""
+        # Find orders waiting approval whose next escalation level is due;
+        # orders past the last level of their stage have no next due date
+        return [
             ('approval_status', '=', 'waiting'),
-            ('write_date', '<=', fields.Datetime.subtract(fields.Datetime.now(), days=escalation_days))
+            ('approval_next_escalation_at', '<=', fields.Datetime.now())
         ]
 
-        purchase_orders = self.env['purchase.order'].search(domain)
-        sales_orders = self.env['sale.order'].search(domain)
+    @api.model
+    def check_escalations(self, chunk_size=ESCALATION_CHUNK_SIZE, auto_commit=False, time_budget=None):
+        """Check for pending approvals that need escalation
+
+        Candidates are walked model by model in id order, chunk_size at a
+        time. The position reached is saved in the escalation cursor after
+        every chunk (and committed when auto_commit is set), so a run that
+        crashes or runs out of time_budget seconds resumes where it stopped
+        instead of starting over. The cursor is cleared once every model
+        has been walked.
+        """
+        Cursor = self.env['approval.escalation.cursor']
+        cursor_model, cursor_id = Cursor._get_position()
+        models_to_walk = list(ESCALATION_MODELS)
+        if cursor_model in models_to_walk:
+            models_to_walk = models_to_walk[models_to_walk.index(cursor_model):]
+        last_id = cursor_id or 0
+        positioned = bool(cursor_model)
 
-        all_orders = purchase_orders + sales_orders
+        domain = self._get_escalation_domain()
+        started_at = time.monotonic()
+        escalated = 0
 
-        for order in all_orders:
-            try:
-                order._send_escalation_notification()
-                _logger.info("Sent escalation notification for %s %s", order._name, order.id)
-            except Exception as e:
-                _logger.error("Failed to send escalation notification for %s %s: %s",
-                              order._name, order.id, str(e))
+        for model_name in models_to_walk:
+            while True:
+                orders = self.env[model_name].search(domain + [('id', '>', last_id)], order='id', limit=chunk_size)
+                if not orders:
+                    break
+
+                default_days = self._get_default_escalation_days()
+                sent = defaultdict(lambda: self.env[model_name])
+                for order in orders:
+                    next_escalation = order.approval_stage_id._get_next_escalation(
+                        order.approval_escalation_level, default_days
+                    )
+                    if not next_escalation:
+                        continue
+                    level = next_escalation[0]
+                    try:
+                        order._send_escalation_notification(level)
+                        sent[level] |= order
+                        _logger.info("Sent level %s escalation notification for %s %s", level, order._name, order.id)
+                    except Exception as e:
+                        _logger.error("Failed to send escalation notification for %s %s: %s",
+                                      order._name, order.id, str(e))
+
+                # Record the level reached, which moves each order to its next due date
+                for level, level_orders in sent.items():
+                    level_orders.write({
+                        'approval_escalation_level': level,
+                        'approval_last_escalated_at': fields.Datetime.now(),
+                    })
+                    escalated += len(level_orders)
+                last_id = orders[-1].id
+                Cursor._save_position(model_name, last_id)
+                positioned = True
+                if auto_commit:
+                    self.env.cr.commit()
+                # Keep memory bounded whatever the size of the backlog
+                self.env.invalidate_all()
+
+                if time_budget and time.monotonic() - started_at > time_budget:
+                    _logger.info("Escalation run paused at %s %s after %s orders", model_name, last_id, escalated)
+                    self._finish_escalation_run(escalated)
+                    self.env.ref('multi_stage_approval.ir_cron_approval_escalation')._trigger()
+                    return escalated
+
+            last_id = 0
+
+        if positioned:
+            Cursor._clear_position()
+        self._finish_escalation_run(escalated)
+        return escalated
+
+    @api.model
+    def _finish_escalation_run(self, escalated):
+        """Hand the queued escalation emails of a run over to the mail queue"""
+        if escalated:
+            self._flush_mail_queue()
 
-    def _send_escalation_notification(self):
+    def _send_escalation_notification(self, level=1):
         """Send escalation notification - base method"""
         try:
             template = self.env.ref('multi_stage_approval.email_template_approval_escalation')
             if template:
-                template.send_mail(self.id, force_send=True)
+                template.send_mail(self.id, force_send=self._use_force_send())
 
             # Also post a chatter message
             self.message_post(
-                body=_("🚨 Escalation notification sent - approval pending for %s days") %
-                     self.env['ir.config_parameter'].sudo().get_param('multi_stage_approval.escalation_days', 2),
+                body=_("🚨 Escalation notification sent (level %s) - approval pending for %s days") % (
+                    level, self._get_default_escalation_days()),
                 subtype_xmlid='mail.mt_comment'
             )
 
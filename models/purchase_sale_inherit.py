@@ -1,4 +1,4 @@
-from odoo import _, models, fields, api
+from odoo import _, models, fields, api, tools, Command
 from odoo.exceptions import UserError, ValidationError
 import logging
 
@@ -17,9 +17,27 @@ class PurchaseOrder(models.Model):
         ('rejected', 'Rejected')
     ], string='Approval Status', default='draft', tracking=True)
     approval_history_ids = fields.One2many('approval.history', 'purchase_order_id', string='Approval History')
+    approval_stage_path = fields.Char(string='Approval Path', readonly=True, copy=False,
+                                      help="Ordered stage ids the order was routed through when approval was requested")
+    approval_stage_position = fields.Integer(string='Approval Path Position', readonly=True, copy=False)
+    approval_stage_entered_at = fields.Datetime(string='Stage Entered On', compute='_compute_approval_stage_entered_at',
+                                                store=True, index=True, readonly=True, copy=False)
+    approval_escalation_level = fields.Integer(string='Escalation Level', compute='_compute_approval_escalation_level',
+                                               store=True, readonly=False, copy=False,
+                                               help="Number of escalations already sent for the current stage")
+    approval_last_escalated_at = fields.Datetime(string='Last Escalated On', readonly=True, copy=False)
+    approval_next_escalation_at = fields.Datetime(string='Next Escalation On',
+                                                  compute='_compute_approval_next_escalation_at',
+                                                  store=True, readonly=True, copy=False)
     requires_approval = fields.Boolean(compute='_compute_requires_approval')
     next_approver_id = fields.Many2one('res.users', compute='_compute_next_approver')
 
+    def init(self):
+        super(PurchaseOrder, self).init()
+        # Escalation selects waiting orders whose next escalation level is due
+        tools.create_index(self._cr, '%s_approval_next_escalation_index' % self._table,
+                           self._table, ['approval_status', 'approval_next_escalation_at'])
+
     @api.model
     def _get_approval_domain(self):
         """Domain for records user can approve"""
@@ -29,113 +47,120 @@ class PurchaseOrder(models.Model):
 
     @api.depends('amount_total', 'company_id')
     def _compute_requires_approval(self):
+        routing = self.env['approval.flow']._get_routing_table()
         for order in self:
-            flow = self.env['approval.flow'].search([
-                ('model', '=', 'purchase.order'),
-                ('company_id', '=', order.company_id.id)
-            ], limit=1)
-            order.requires_approval = bool(flow and flow.stage_ids)
+            route = routing.get(('purchase.order', order.company_id.id))
+            order.requires_approval = bool(route and route.stage_ids)
+
+    @api.depends('approval_stage_id', 'approval_status')
+    def _compute_approval_stage_entered_at(self):
+        now = fields.Datetime.now()
+        for order in self:
+            if order.approval_status == 'waiting':
+                order.approval_stage_entered_at = now
+            else:
+                order.approval_stage_entered_at = order.approval_stage_entered_at
+
+    @api.depends('approval_stage_entered_at')
+    def _compute_approval_escalation_level(self):
+        # Entering a stage starts its escalations over
+        self.approval_escalation_level = 0
+
+    # Changes of a stage escalation chain or of the company calendar
+    # reschedule only the waiting orders concerned, see
+    # approval.notification.system._recompute_escalation_dates
+    @api.depends('approval_stage_entered_at', 'approval_stage_id', 'approval_status', 'approval_escalation_level')
+    def _compute_approval_next_escalation_at(self):
+        default_days = self.env['approval.notification.system']._get_default_escalation_days()
+        working_calendar = self.env['approval.working.calendar']
+        for order in self:
+            if order.approval_status != 'waiting':
+                order.approval_next_escalation_at = False
+                continue
+            next_escalation = order.approval_stage_entered_at and order.approval_stage_id._get_next_escalation(
+                order.approval_escalation_level, default_days
+            )
+            order.approval_next_escalation_at = next_escalation and working_calendar._add_working_days(
+                order.company_id, order.approval_stage_entered_at, next_escalation[1]
+            )
 
     @api.depends('approval_stage_id', 'approval_status')
     def _compute_next_approver(self):
+        resolver = self.env['approval.approver.resolver']
         for order in self:
             if order.approval_status == 'waiting' and order.approval_stage_id:
                 # Get users from the approver group of current stage
-                approver_group = order.approval_stage_id.role_id
-                approvers = self.env['res.users'].search([('groups_id', 'in', approver_group.ids)])
-                order.next_approver_id = approvers[0] if approvers else False
+                approvers = resolver._get_approvers(order.approval_stage_id.role_id)
+                order.next_approver_id = approvers[0].user_id if approvers else False
             else:
                 order.next_approver_id = False
 
-    def action_request_approval(self):
+    def action_request_approval(self, idempotency_key=None):
         """Initiate approval process with enhanced messaging and notifications"""
-        for order in self:
-            if order.approval_status != 'draft':
-                raise UserError(_("Approval can only be requested from draft status."))
-
-            flow = order.approval_flow_id or self.env['approval.flow'].search([
-                ('model', '=', 'purchase.order'),
-                ('company_id', '=', order.company_id.id)
-            ], limit=1)
-
-            if not flow:
-                raise UserError(_("No approval flow configured for purchase orders."))
-
-            first_stage = flow.stage_ids.sorted('sequence')[:1]
-            if not first_stage:
-                raise UserError(_("No approval stages configured in the flow."))
-
-            order.write({
-                'approval_flow_id': flow.id,
-                'approval_stage_id': first_stage.id,
-                'approval_status': 'waiting'
-            })
+        return self.env['approval.idempotency.key']._run_once(
+            self, 'request_approval', idempotency_key, lambda: self.env['approval.engine']._request_approval(self)
+        )
 
-            # Create approval history record
-            self.env['approval.history'].create({
-                'purchase_order_id': order.id,
-                'stage_id': first_stage.id,
-                'action': 'requested',
-                'user_id': self.env.user.id
-            })
+    def _get_approval_request_flow(self, routing):
+        """Validate an approval request and return the flow it goes through"""
+        self.ensure_one()
+        if self.approval_status != 'draft':
+            raise UserError(_("Approval can only be requested from draft status."))
+
+        route = routing.get(('purchase.order', self.company_id.id))
+        flow = self.approval_flow_id or self.env['approval.flow'].browse(route.flow_id if route else [])
+        if not flow:
+            raise UserError(_("No approval flow configured for purchase orders."))
+        return flow
+
+    def _prepare_approval_history_vals(self, stage, action, note=False):
+        """Return the approval.history values of an action on this order"""
+        self.ensure_one()
+        return {
+            'purchase_order_id': self.id,
+            'stage_id': stage.id,
+            'action': action,
+            'user_id': self.env.user.id,
+            'note': note,
+        }
+
+    def action_approve(self, idempotency_key=None):
+        """Approve current stage and move to next with enhanced notifications"""
+        return self.env['approval.idempotency.key']._run_once(
+            self, 'approve', idempotency_key, lambda: self.env['approval.engine']._approve(self)
+        )
 
-            # Enhanced chatter messaging
+    def _on_approval_stage_advanced(self, next_stage):
+        """Announce the next stage and notify its approvers"""
+        for order in self:
             order.message_post(
-                body=_("Approval requested by %s. Current Stage: %s") % (self.env.user.name, first_stage.name),
+                body=_("Approved by %s. Moved to next stage: %s") % (self.env.user.name, next_stage.name),
                 subtype_xmlid='mail.mt_comment'
             )
 
-            # Send email notifications
-            order._send_approval_notifications(first_stage)
+        # Send notifications for next stage
+        self._send_approval_notifications(next_stage)
 
-            # Create activity for approvers
-            self._create_approval_activity(order, first_stage)
+        # Create activity for next stage approvers
+        self._create_approval_activity(self, next_stage)
 
-    def action_approve(self):
-        """Approve current stage and move to next with enhanced notifications"""
+    def _on_approval_completed(self):
+        """Announce full approval, notify requesters and auto-confirm"""
         for order in self:
-            if order.approval_status != 'waiting':
-                raise UserError(_("Only orders waiting approval can be approved."))
-
-            if not self._check_approval_rights(order):
-                raise UserError(_("You don't have permission to approve this stage."))
-
-            # Create approval history
-            self.env['approval.history'].create({
-                'purchase_order_id': order.id,
-                'stage_id': order.approval_stage_id.id,
-                'action': 'approved',
-                'user_id': self.env.user.id,
-                'note': 'Approved via button'
-            })
-
-            # Move to next stage or complete approval
-            next_stage = self._get_next_stage(order)
-            if next_stage:
-                order.approval_stage_id = next_stage
-                order.message_post(
-                    body=_("Approved by %s. Moved to next stage: %s") % (self.env.user.name, next_stage.name),
-                    subtype_xmlid='mail.mt_comment'
-                )
+            order.message_post(
+                body=_("Fully approved by %s") % self.env.user.name,
+                subtype_xmlid='mail.mt_comment'
+            )
 
-                # Send notifications for next stage
-                order._send_approval_notifications(next_stage)
+            # Send approval completion notification
+            order._send_approval_complete_notification()
 
-                # Create activity for next stage approvers
-                self._create_approval_activity(order, next_stage)
-            else:
-                order.approval_status = 'approved'
-                order.message_post(
-                    body=_("Fully approved by %s") % self.env.user.name,
-                    subtype_xmlid='mail.mt_comment'
-                )
+        # Wake the mail queue once for the whole batch
+        self.env['approval.notification.system']._flush_mail_queue()
 
-                # Send approval completion notification
-                order._send_approval_complete_notification()
-
-                # Auto confirm purchase order if configured
-                if self._should_auto_confirm():
-                    order.button_confirm()
+        # Auto confirm purchase orders if configured
+        if self._should_auto_confirm():
+            self.button_confirm()
 
     def _send_approval_notifications(self, stage):
         """Send email and/or chat notifications for approval requests"""
@@ -149,60 +174,70 @@ class PurchaseOrder(models.Model):
 
     def _send_email_notification(self, stage):
         """Send email notification to approvers"""
-        try:
-            # Get appropriate email template based on model
-            if self._name == 'purchase.order':
-                template = self.env.ref('multi_stage_approval.email_template_approval_request')
-            else:
-                template = self.env.ref('multi_stage_approval.email_template_sales_approval_request')
-
-            # Send email to all approvers in the stage group
-            approver_group = stage.role_id
-            approvers = self.env['res.users'].search([
-                ('groups_id', 'in', approver_group.ids),
-                ('id', '!=', self.env.user.id)  # Exclude current user
-            ])
-
-            for approver in approvers:
-                if approver.email:
-                    template.with_context(
-                        lang=approver.lang,
-                        email_to=approver.email
-                    ).send_mail(self.id, force_send=True)
+        # Get appropriate email template based on model
+        if self._name == 'purchase.order':
+            template = self.env.ref('multi_stage_approval.email_template_approval_request', raise_if_not_found=False)
+        else:
+            template = self.env.ref('multi_stage_approval.email_template_sales_approval_request', raise_if_not_found=False)
+        if not template:
+            return
 
-        except Exception as e:
-            # Log error but don't break the approval process
-            self.message_post(
-                body=_("Failed to send email notification: %s") % str(e),
-                subtype_xmlid='mail.mt_comment'
-            )
+        # Send email to all approvers in the stage group, except the current user
+        approvers = self.env['approval.approver.resolver']._get_approvers(
+            stage.role_id, exclude_user=self.env.user
+        )
+        recipients_by_lang = self.env['approval.approver.resolver']._get_email_recipients_by_lang(approvers)
+        force_send = self.env['approval.notification.system']._use_force_send()
+
+        # Render once per (order, language) and address each rendering to
+        # every approver reading that language
+        for lang, partner_ids in recipients_by_lang.items():
+            try:
+                template.with_context(lang=lang).send_mail_batch(
+                    self.ids,
+                    force_send=force_send,
+                    email_values={
+                        'email_to': False,
+                        'recipient_ids': [Command.link(partner_id) for partner_id in partner_ids],
+                    },
+                )
+
+            except Exception as e:
+                # Log error but don't break the approval process
+                for order in self:
+                    order.message_post(
+                        body=_("Failed to send email notification: %s") % str(e),
+                        subtype_xmlid='mail.mt_comment'
+                    )
 
     def _send_chat_notification(self, stage):
         """Send chat notification to approvers"""
         try:
-            approver_group = stage.role_id
-            approvers = self.env['res.users'].search([
-                ('groups_id', 'in', approver_group.ids),
-                ('id', '!=', self.env.user.id)
-            ])
-
-            for approver in approvers:
-                # Create a direct notification
-                self.env['mail.message'].create({
-                    'model': self._name,
-                    'res_id': self.id,
-                    'body': _('Approval required for %s. Current stage: %s') % (self.name, stage.name),
-                    'partner_ids': [(6, 0, [approver.partner_id.id])],
-                    'subject': _('Approval Required'),
-                    'message_type': 'notification',
-                })
+            approvers = self.env['approval.approver.resolver']._get_approvers(
+                stage.role_id, exclude_user=self.env.user
+            )
+
+            if not approvers:
+                return
+
+            # One direct notification per order, addressed to every approver
+            partner_ids = [approver.partner_id for approver in approvers]
+            self.env['mail.message'].create([{
+                'model': order._name,
+                'res_id': order.id,
+                'body': _('Approval required for %s. Current stage: %s') % (order.name, stage.name),
+                'partner_ids': [(6, 0, partner_ids)],
+                'subject': _('Approval Required'),
+                'message_type': 'notification',
+            } for order in self])
 
         except Exception as e:
             # Log error but don't break the approval process
-            self.message_post(
-                body=_("Failed to send chat notification: %s") % str(e),
-                subtype_xmlid='mail.mt_comment'
-            )
+            for order in self:
+                order.message_post(
+                    body=_("Failed to send chat notification: %s") % str(e),
+                    subtype_xmlid='mail.mt_comment'
+                )
 
     def _send_approval_complete_notification(self):
         """Send notification when approval is complete"""
@@ -213,7 +248,7 @@ class PurchaseOrder(models.Model):
                 template.with_context(
                     lang=self.create_uid.lang,
                     email_to=self.create_uid.email
-                ).send_mail(self.id, force_send=True)
+                ).send_mail(self.id, force_send=self.env['approval.notification.system']._use_force_send())
 
         except Exception as e:
             self.message_post(
@@ -223,9 +258,7 @@ class PurchaseOrder(models.Model):
 
     def _get_notification_method(self):
         """Get notification method from configuration"""
-        method = self.env['ir.config_parameter'].sudo().get_param(
-            'multi_stage_approval.notification_method', 'both'
-        )
+        method = self.env['approval.settings']._get_settings().notification_method
 
         if method == 'email':
             return ['email']
@@ -236,20 +269,11 @@ class PurchaseOrder(models.Model):
 
     def action_reject(self):
         """Reject the purchase order with enhanced messaging"""
-        for order in self:
-            if order.approval_status != 'waiting':
-                raise UserError(_("Only orders waiting approval can be rejected."))
-
-            # Create rejection history
-            self.env['approval.history'].create({
-                'purchase_order_id': order.id,
-                'stage_id': order.approval_stage_id.id,
-                'action': 'rejected',
-                'user_id': self.env.user.id,
-                'note': 'Rejected via button'
-            })
+        self.env['approval.engine']._reject(self)
 
-            order.approval_status = 'rejected'
+    def _on_approval_rejected(self):
+        """Announce the rejection in the chatter"""
+        for order in self:
             order.message_post(
                 body=_("Rejected by %s") % self.env.user.name,
                 subtype_xmlid='mail.mt_comment'
@@ -257,24 +281,23 @@ class PurchaseOrder(models.Model):
 
     def _create_approval_activity(self, order, stage):
         """Create approval activity for approvers"""
-        approver_group = stage.role_id
-        approvers = self.env['res.users'].search([
-            ('groups_id', 'in', approver_group.ids),
-            ('id', '!=', self.env.user.id)  # Exclude current user
-        ])
-
-        for approver in approvers:
-            order.activity_schedule(
-                'multi_stage_approval.mail_activity_approval',
-                user_id=approver.id,
-                note=_('Approval required for %s. Current stage: %s. Amount: %s %s') % (
-                    order.name,
+        approvers = self.env['approval.approver.resolver']._get_approvers(
+            stage.role_id, exclude_user=self.env.user  # Exclude current user
+        )
+
+        self.env['approval.engine']._schedule_approval_activities(
+            order,
+            [approver.user_id for approver in approvers],
+            summary=_('Approval Required - %s') % stage.name,
+            notes={
+                record.id: _('Approval required for %s. Current stage: %s. Amount: %s %s') % (
+                    record.name,
                     stage.name,
-                    order.amount_total,
-                    order.currency_id.name
-                ),
-                summary=_('Approval Required - %s') % stage.name
-            )
+                    record.amount_total,
+                    record.currency_id.name
+                ) for record in order
+            },
+        )
 
     def _check_approval_rights(self, order):
         """Check if current user can approve this stage"""
@@ -282,15 +305,28 @@ class PurchaseOrder(models.Model):
 
     def _get_next_stage(self, order):
         """Get next stage in sequence"""
-        stages = order.approval_flow_id.stage_ids.sorted('sequence')
-        current_index = stages.ids.index(order.approval_stage_id.id)
-        return stages[current_index + 1] if current_index + 1 < len(stages) else False
+        stage_path = order._get_approval_stage_path()
+        if not stage_path:
+            # Orders requested before stage paths were stored on the order
+            stage_path = order.approval_flow_id._get_stage_path()
+            position = stage_path.index(order.approval_stage_id.id)
+            order.write({
+                'approval_stage_path': ','.join(str(stage_id) for stage_id in stage_path),
+                'approval_stage_position': position,
+            })
+        position = order.approval_stage_position + 1
+        return self.env['approval.stage'].browse(stage_path[position]) if position < len(stage_path) else False
+
+    def _get_approval_stage_path(self):
+        """Return the frozen stage path of the order as a list of stage ids"""
+        self.ensure_one()
+        if not self.approval_stage_path:
+            return []
+        return [int(stage_id) for stage_id in self.approval_stage_path.split(',')]
 
     def _should_auto_confirm(self):
         """Check if purchase order should be auto-confirmed after approval"""
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'multi_stage_approval.auto_confirm', False
-        )
+        return self.env['approval.settings']._get_settings().auto_confirm
 
     # Override purchase order confirmation to require approval
     def button_confirm(self):
@@ -305,25 +341,41 @@ class PurchaseOrder(models.Model):
 
     def get_approval_url(self):
         """Generate approval URL for email templates"""
-        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        base_url = self.env['approval.settings']._get_settings().base_url
         return f"{base_url}/web#id={self.id}&model={self._name}&view_type=form"
 
-    def _send_escalation_notification(self):
+    def _send_escalation_notification(self, level=1):
         """Send escalation notification for purchase orders"""
         try:
             template = self.env.ref('multi_stage_approval.email_template_approval_escalation')
             if template:
-                template.send_mail(self.id, force_send=True)
+                template.send_mail(
+                    self.id,
+                    force_send=self.env['approval.notification.system']._use_force_send(),
+                    email_values=self._get_escalation_email_values(level),
+                )
 
             # Post chatter message
             self.message_post(
-                body=_("🚨 Escalation notification sent - approval pending beyond threshold"),
+                body=_("🚨 Escalation notification sent (level %s) - approval pending beyond threshold") % level,
                 subtype_xmlid='mail.mt_comment'
             )
 
         except Exception as e:
             _logger.error("Failed to send escalation email for purchase order %s: %s", self.id, str(e))
 
+    def _get_escalation_email_values(self, level):
+        """Address the escalation email to the audience of its level
+
+        Without any reachable member in that audience the template
+        recipients are kept.
+        """
+        recipients = self.approval_stage_id and self.approval_stage_id._get_escalation_recipients(level)
+        partner_ids = [recipient.partner_id for recipient in recipients or [] if recipient.email]
+        if not partner_ids:
+            return None
+        return {'email_to': False, 'recipient_ids': [Command.link(partner_id) for partner_id in partner_ids]}
+
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
@@ -337,9 +389,27 @@ class SaleOrder(models.Model):
         ('rejected', 'Rejected')
     ], string='Approval Status', default='draft', tracking=True)
     approval_history_ids = fields.One2many('approval.history', 'sale_order_id', string='Approval History')
+    approval_stage_path = fields.Char(string='Approval Path', readonly=True, copy=False,
+                                      help="Ordered stage ids the order was routed through when approval was requested")
+    approval_stage_position = fields.Integer(string='Approval Path Position', readonly=True, copy=False)
+    approval_stage_entered_at = fields.Datetime(string='Stage Entered On', compute='_compute_approval_stage_entered_at',
+                                                store=True, index=True, readonly=True, copy=False)
+    approval_escalation_level = fields.Integer(string='Escalation Level', compute='_compute_approval_escalation_level',
+                                               store=True, readonly=False, copy=False,
+                                               help="Number of escalations already sent for the current stage")
+    approval_last_escalated_at = fields.Datetime(string='Last Escalated On', readonly=True, copy=False)
+    approval_next_escalation_at = fields.Datetime(string='Next Escalation On',
+                                                  compute='_compute_approval_next_escalation_at',
+                                                  store=True, readonly=True, copy=False)
     requires_approval = fields.Boolean(compute='_compute_requires_approval')
     next_approver_id = fields.Many2one('res.users', compute='_compute_next_approver')
 
+    def init(self):
+        super(SaleOrder, self).init()
+        # Escalation selects waiting orders whose next escalation level is due
+        tools.create_index(self._cr, '%s_approval_next_escalation_index' % self._table,
+                           self._table, ['approval_status', 'approval_next_escalation_at'])
+
     @api.model
     def _get_approval_domain(self):
         """Domain for records user can approve"""
@@ -349,70 +419,85 @@ class SaleOrder(models.Model):
 
     @api.depends('amount_total', 'company_id')
     def _compute_requires_approval(self):
+        routing = self.env['approval.flow']._get_routing_table()
         for order in self:
-            flow = self.env['approval.flow'].search([
-                ('model', '=', 'sale.order'),
-                ('company_id', '=', order.company_id.id)
-            ], limit=1)
-            order.requires_approval = bool(flow and flow.stage_ids)
+            route = routing.get(('sale.order', order.company_id.id))
+            order.requires_approval = bool(route and route.stage_ids)
+
+    @api.depends('approval_stage_id', 'approval_status')
+    def _compute_approval_stage_entered_at(self):
+        now = fields.Datetime.now()
+        for order in self:
+            if order.approval_status == 'waiting':
+                order.approval_stage_entered_at = now
+            else:
+                order.approval_stage_entered_at = order.approval_stage_entered_at
+
+    @api.depends('approval_stage_entered_at')
+    def _compute_approval_escalation_level(self):
+        # Entering a stage starts its escalations over
+        self.approval_escalation_level = 0
+
+    # Changes of a stage escalation chain or of the company calendar
+    # reschedule only the waiting orders concerned, see
+    # approval.notification.system._recompute_escalation_dates
+    @api.depends('approval_stage_entered_at', 'approval_stage_id', 'approval_status', 'approval_escalation_level')
+    def _compute_approval_next_escalation_at(self):
+        default_days = self.env['approval.notification.system']._get_default_escalation_days()
+        working_calendar = self.env['approval.working.calendar']
+        for order in self:
+            if order.approval_status != 'waiting':
+                order.approval_next_escalation_at = False
+                continue
+            next_escalation = order.approval_stage_entered_at and order.approval_stage_id._get_next_escalation(
+                order.approval_escalation_level, default_days
+            )
+            order.approval_next_escalation_at = next_escalation and working_calendar._add_working_days(
+                order.company_id, order.approval_stage_entered_at, next_escalation[1]
+            )
 
     @api.depends('approval_stage_id', 'approval_status')
     def _compute_next_approver(self):
+        resolver = self.env['approval.approver.resolver']
         for order in self:
             if order.approval_status == 'waiting' and order.approval_stage_id:
                 # Get users from the approver group of current stage
-                approver_group = order.approval_stage_id.role_id
-                approvers = self.env['res.users'].search([('groups_id', 'in', approver_group.ids)])
-                order.next_approver_id = approvers[0] if approvers else False
+                approvers = resolver._get_approvers(order.approval_stage_id.role_id)
+                order.next_approver_id = approvers[0].user_id if approvers else False
             else:
                 order.next_approver_id = False
 
-    def action_request_approval(self):
+    def action_request_approval(self, idempotency_key=None):
         """Sales order specific approval request with notifications"""
-        for order in self:
-            if order.state != 'draft':
-                raise UserError(_("Approval can only be requested from draft quotation."))
-
-            if order.approval_status != 'draft':
-                raise UserError(_("Approval can only be requested from draft status."))
-
-            flow = order.approval_flow_id or self.env['approval.flow'].search([
-                ('model', '=', 'sale.order'),
-                ('company_id', '=', order.company_id.id)
-            ], limit=1)
-
-            if not flow:
-                raise UserError(_("No approval flow configured for sales orders."))
-
-            first_stage = flow.stage_ids.sorted('sequence')[:1]
-            if not first_stage:
-                raise UserError(_("No approval stages configured in the flow."))
-
-            order.write({
-                'approval_flow_id': flow.id,
-                'approval_stage_id': first_stage.id,
-                'approval_status': 'waiting'
-            })
-
-            # Create approval history record
-            self.env['approval.history'].create({
-                'sale_order_id': order.id,
-                'stage_id': first_stage.id,
-                'action': 'requested',
-                'user_id': self.env.user.id
-            })
-
-            # Enhanced chatter messaging
-            order.message_post(
-                body=_("Approval requested by %s. Current Stage: %s") % (self.env.user.name, first_stage.name),
-                subtype_xmlid='mail.mt_comment'
-            )
-
-            # Send email notifications
-            order._send_approval_notifications(first_stage)
+        return self.env['approval.idempotency.key']._run_once(
+            self, 'request_approval', idempotency_key, lambda: self.env['approval.engine']._request_approval(self)
+        )
 
-            # Create activity for approvers
-            self._create_approval_activity(order, first_stage)
+    def _get_approval_request_flow(self, routing):
+        """Validate an approval request and return the flow it goes through"""
+        self.ensure_one()
+        if self.state != 'draft':
+            raise UserError(_("Approval can only be requested from draft quotation."))
+
+        if self.approval_status != 'draft':
+            raise UserError(_("Approval can only be requested from draft status."))
+
+        route = routing.get(('sale.order', self.company_id.id))
+        flow = self.approval_flow_id or self.env['approval.flow'].browse(route.flow_id if route else [])
+        if not flow:
+            raise UserError(_("No approval flow configured for sales orders."))
+        return flow
+
+    def _prepare_approval_history_vals(self, stage, action, note=False):
+        """Return the approval.history values of an action on this order"""
+        self.ensure_one()
+        return {
+            'sale_order_id': self.id,
+            'stage_id': stage.id,
+            'action': action,
+            'user_id': self.env.user.id,
+            'note': note,
+        }
 
     def _send_approval_notifications(self, stage):
         """Send email and/or chat notifications for approval requests"""
@@ -426,59 +511,69 @@ class SaleOrder(models.Model):
 
     def _send_email_notification(self, stage):
         """Send email notification to approvers"""
-        try:
-            template = self.env.ref('multi_stage_approval.email_template_sales_approval_request')
-
-            # Send email to all approvers in the stage group
-            approver_group = stage.role_id
-            approvers = self.env['res.users'].search([
-                ('groups_id', 'in', approver_group.ids),
-                ('id', '!=', self.env.user.id)
-            ])
-
-            for approver in approvers:
-                if approver.email:
-                    template.with_context(
-                        lang=approver.lang,
-                        email_to=approver.email
-                    ).send_mail(self.id, force_send=True)
+        template = self.env.ref('multi_stage_approval.email_template_sales_approval_request', raise_if_not_found=False)
+        if not template:
+            return
 
-        except Exception as e:
-            self.message_post(
-                body=_("Failed to send email notification: %s") % str(e),
-                subtype_xmlid='mail.mt_comment'
-            )
+        # Send email to all approvers in the stage group, except the current user
+        approvers = self.env['approval.approver.resolver']._get_approvers(
+            stage.role_id, exclude_user=self.env.user
+        )
+        recipients_by_lang = self.env['approval.approver.resolver']._get_email_recipients_by_lang(approvers)
+        force_send = self.env['approval.notification.system']._use_force_send()
+
+        # Render once per (order, language) and address each rendering to
+        # every approver reading that language
+        for lang, partner_ids in recipients_by_lang.items():
+            try:
+                template.with_context(lang=lang).send_mail_batch(
+                    self.ids,
+                    force_send=force_send,
+                    email_values={
+                        'email_to': False,
+                        'recipient_ids': [Command.link(partner_id) for partner_id in partner_ids],
+                    },
+                )
+
+            except Exception as e:
+                for order in self:
+                    order.message_post(
+                        body=_("Failed to send email notification: %s") % str(e),
+                        subtype_xmlid='mail.mt_comment'
+                    )
 
     def _send_chat_notification(self, stage):
         """Send chat notification to approvers"""
         try:
-            approver_group = stage.role_id
-            approvers = self.env['res.users'].search([
-                ('groups_id', 'in', approver_group.ids),
-                ('id', '!=', self.env.user.id)
-            ])
-
-            for approver in approvers:
-                self.env['mail.message'].create({
-                    'model': self._name,
-                    'res_id': self.id,
-                    'body': _('Approval required for %s. Current stage: %s') % (self.name, stage.name),
-                    'partner_ids': [(6, 0, [approver.partner_id.id])],
-                    'subject': _('Approval Required'),
-                    'message_type': 'notification',
-                })
+            approvers = self.env['approval.approver.resolver']._get_approvers(
+                stage.role_id, exclude_user=self.env.user
+            )
+
+            if not approvers:
+                return
+
+            # One direct notification per order, addressed to every approver
+            partner_ids = [approver.partner_id for approver in approvers]
+            self.env['mail.message'].create([{
+                'model': order._name,
+                'res_id': order.id,
+                'body': _('Approval required for %s. Current stage: %s') % (order.name, stage.name),
+                'partner_ids': [(6, 0, partner_ids)],
+                'subject': _('Approval Required'),
+                'message_type': 'notification',
+            } for order in self])
 
         except Exception as e:
-            self.message_post(
-                body=_("Failed to send chat notification: %s") % str(e),
-                subtype_xmlid='mail.mt_comment'
-            )
+            # Log error but don't break the approval process
+            for order in self:
+                order.message_post(
+                    body=_("Failed to send chat notification: %s") % str(e),
+                    subtype_xmlid='mail.mt_comment'
+                )
 
     def _get_notification_method(self):
         """Get notification method from configuration"""
-        method = self.env['ir.config_parameter'].sudo().get_param(
-            'multi_stage_approval.notification_method', 'both'
-        )
+        method = self.env['approval.settings']._get_settings().notification_method
 
         if method == 'email':
             return ['email']
@@ -487,76 +582,55 @@ class SaleOrder(models.Model):
         else:
             return ['email', 'chat']
 
-    def action_approve(self):
+    def action_approve(self, idempotency_key=None):
         """Approve current stage and move to next"""
+        return self.env['approval.idempotency.key']._run_once(
+            self, 'approve', idempotency_key, lambda: self.env['approval.engine']._approve(self)
+        )
+
+    def _on_approval_stage_advanced(self, next_stage):
+        """Announce the next stage in the chatter"""
         for order in self:
-            if order.approval_status != 'waiting':
-                raise UserError(_("Only orders waiting approval can be approved."))
-
-            if not self._check_approval_rights(order):
-                raise UserError(_("You don't have permission to approve this stage."))
-
-            # Create approval history
-            self.env['approval.history'].create({
-                'sale_order_id': order.id,
-                'stage_id': order.approval_stage_id.id,
-                'action': 'approved',
-                'user_id': self.env.user.id,
-                'note': 'Approved via button'
-            })
+            order.message_post(body=_("Approved by %s. Moved to next stage: %s") %
+                                    (self.env.user.name, next_stage.name))
 
-            # Move to next stage or complete approval
-            next_stage = self._get_next_stage(order)
-            if next_stage:
-                order.approval_stage_id = next_stage
-                order.message_post(body=_("Approved by %s. Moved to next stage: %s") %
-                                        (self.env.user.name, next_stage.name))
-            else:
-                order.approval_status = 'approved'
-                order.message_post(body=_("✅ Fully approved by %s") % self.env.user.name)
+    def _on_approval_completed(self):
+        """Announce full approval and auto-confirm"""
+        for order in self:
+            order.message_post(body=_("✅ Fully approved by %s") % self.env.user.name)
 
-                # Auto confirm sales order if configured
-                if self._should_auto_confirm():
-                    order.action_confirm()
+        # Auto confirm sales orders if configured
+        if self._should_auto_confirm():
+            self.action_confirm()
 
     def action_reject(self):
         """Reject the sales order"""
-        for order in self:
-            if order.approval_status != 'waiting':
-                raise UserError(_("Only orders waiting approval can be rejected."))
-
-            # Create rejection history
-            self.env['approval.history'].create({
-                'sale_order_id': order.id,
-                'stage_id': order.approval_stage_id.id,
-                'action': 'rejected',
-                'user_id': self.env.user.id,
-                'note': 'Rejected via button'
-            })
+        self.env['approval.engine']._reject(self)
 
-            order.approval_status = 'rejected'
+    def _on_approval_rejected(self):
+        """Announce the rejection in the chatter"""
+        for order in self:
             order.message_post(body=_("❌ Rejected by %s") % self.env.user.name)
 
     def _create_approval_activity(self, order, stage):
         """Create approval activity for sales approvers"""
-        approver_group = stage.role_id
-        approvers = self.env['res.users'].search([
-            ('groups_id', 'in', approver_group.ids),
-            ('id', '!=', self.env.user.id)  # Exclude current user
-        ])
-
-        for approver in approvers:
-            order.activity_schedule(
-                'multi_stage_approval.mail_activity_approval',
-                user_id=approver.id,
-                note=_('Approval required for %s. Current stage: %s. Amount: %s %s') % (
-                    order.name,
+        approvers = self.env['approval.approver.resolver']._get_approvers(
+            stage.role_id, exclude_user=self.env.user  # Exclude current user
+        )
+
+        self.env['approval.engine']._schedule_approval_activities(
+            order,
+            [approver.user_id for approver in approvers],
+            summary=_('Approval Required - %s') % stage.name,
+            notes={
+                record.id: _('Approval required for %s. Current stage: %s. Amount: %s %s') % (
+                    record.name,
                     stage.name,
-                    order.amount_total,
-                    order.currency_id.name
-                ),
-                summary=_('Approval Required - %s') % stage.name
-            )
+                    record.amount_total,
+                    record.currency_id.name
+                ) for record in order
+            },
+        )
 
     def _check_approval_rights(self, order):
         """Check if current user can approve this stage"""
@@ -564,15 +638,28 @@ class SaleOrder(models.Model):
 
     def _get_next_stage(self, order):
         """Get next stage in sequence"""
-        stages = order.approval_flow_id.stage_ids.sorted('sequence')
-        current_index = stages.ids.index(order.approval_stage_id.id)
-        return stages[current_index + 1] if current_index + 1 < len(stages) else False
+        stage_path = order._get_approval_stage_path()
+        if not stage_path:
+            # Orders requested before stage paths were stored on the order
+            stage_path = order.approval_flow_id._get_stage_path()
+            position = stage_path.index(order.approval_stage_id.id)
+            order.write({
+                'approval_stage_path': ','.join(str(stage_id) for stage_id in stage_path),
+                'approval_stage_position': position,
+            })
+        position = order.approval_stage_position + 1
+        return self.env['approval.stage'].browse(stage_path[position]) if position < len(stage_path) else False
+
+    def _get_approval_stage_path(self):
+        """Return the frozen stage path of the order as a list of stage ids"""
+        self.ensure_one()
+        if not self.approval_stage_path:
+            return []
+        return [int(stage_id) for stage_id in self.approval_stage_path.split(',')]
 
     def _should_auto_confirm(self):
         """Check if sales order should be auto-confirmed after approval"""
-        return self.env['ir.config_parameter'].sudo().get_param(
-            'multi_stage_approval.auto_confirm', False
-        )
+        return self.env['approval.settings']._get_settings().auto_confirm
 
     # Override sales order confirmation to require approval
     def action_confirm(self):
@@ -587,21 +674,37 @@ class SaleOrder(models.Model):
 
     def get_approval_url(self):
         """Generate approval URL for email templates"""
-        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        base_url = self.env['approval.settings']._get_settings().base_url
         return f"{base_url}/web#id={self.id}&model={self._name}&view_type=form"
 
-    def _send_escalation_notification(self):
+    def _send_escalation_notification(self, level=1):
         """Send escalation notification for sales orders"""
         try:
             template = self.env.ref('multi_stage_approval.email_template_approval_escalation')
             if template:
-                template.send_mail(self.id, force_send=True)
+                template.send_mail(
+                    self.id,
+                    force_send=self.env['approval.notification.system']._use_force_send(),
+                    email_values=self._get_escalation_email_values(level),
+                )
 
             # Post chatter message
             self.message_post(
-                body=_("🚨 Escalation notification sent - approval pending beyond threshold"),
+                body=_("🚨 Escalation notification sent (level %s) - approval pending beyond threshold") % level,
                 subtype_xmlid='mail.mt_comment'
             )
 
         except Exception as e:
-            _logger.error("Failed to send escalation email for sales order %s: %s", self.id, str(e))
\ No newline at end of file
+            _logger.error("Failed to send escalation email for sales order %s: %s", self.id, str(e))
+
+    def _get_escalation_email_values(self, level):
+        """Address the escalation email to the audience of its level
+
+        Without any reachable member in that audience the template
+        recipients are kept.
+        """
+        recipients = self.approval_stage_id and self.approval_stage_id._get_escalation_recipients(level)
+        partner_ids = [recipient.partner_id for recipient in recipients or [] if recipient.email]
+        if not partner_ids:
+            return None
+        return {'email_to': False, 'recipient_ids': [Command.link(partner_id) for partner_id in partner_ids]}
\ No newline at end of file
@@ -7,4 +7,5 @@ from . import test_reports
 from . import test_integration
 from . import test_performance
 from . import test_edge_cases
-from . import test_final_validation
\ No newline at end of file
+from . import test_final_validation
+from . import test_concurrency
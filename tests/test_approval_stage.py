@@ -85,4 +85,38 @@ class TestApprovalStage(TransactionCase):
                 'role_id': group.id,
                 'minimum_amount': 1000,
                 'maximum_amount': 500,  # Less than minimum
-            })
\ No newline at end of file
+            })
+
+    def test_routing_table_invalidation(self):
+        """Test that the compiled routing table follows flow and stage writes"""
+        group = self.ResGroups.create({'name': 'Test Approvers'})
+        flow = self.ApprovalFlow.create({
+            'name': 'Routing Flow',
+            'model': 'purchase.order'
+        })
+
+        route = self.ApprovalFlow._get_route('purchase.order', flow.company_id.id)
+        self.assertEqual(route.flow_id, flow.id)
+        self.assertFalse(route.stage_ids)
+
+        stage2 = self.ApprovalStage.create({
+            'name': 'Stage 2',
+            'sequence': 20,
+            'approval_flow_id': flow.id,
+            'role_id': group.id,
+            'minimum_amount': 1000,
+        })
+        stage1 = self.ApprovalStage.create({
+            'name': 'Stage 1',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': group.id,
+            'maximum_amount': 1000,
+        })
+
+        route = self.ApprovalFlow._get_route('purchase.order', flow.company_id.id)
+        self.assertEqual(route.stage_ids, (stage1.id, stage2.id))
+        self.assertEqual(route.bands[0], (stage1.id, 0.0, 1000.0))
+
+        flow.active = False
+        self.assertIsNone(self.ApprovalFlow._get_route('purchase.order', flow.company_id.id))
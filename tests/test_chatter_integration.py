@@ -171,4 +171,136 @@ class TestChatterIntegration(TransactionCase):
         message_count_after_request = self.MailMessage.search_count(
             [('model', '=', 'sale.order'), ('res_id', '=', so.id)])
         self.assertGreater(message_count_after_request, initial_message_count,
-                           "Chatter message should be posted on sales approval request")
\ No newline at end of file
+                           "Chatter message should be posted on sales approval request")
+
+    def test_chat_notification_single_message(self):
+        """Test that chat notifications add one message per order, whatever the group size"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Chat Flow',
+            'model': 'purchase.order'
+        })
+        stage = self.ApprovalStage.create({
+            'name': 'Chat Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        approvers = self.env['res.users'].create([{
+            'name': f'Chat Approver {i}',
+            'login': f'chat_approver_{i}@example.com',
+            'groups_id': [(4, self.approver_group.id)]
+        } for i in range(20)])
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+
+        domain = [('model', '=', 'purchase.order'), ('res_id', '=', po.id), ('message_type', '=', 'notification')]
+        before = self.MailMessage.search_count(domain)
+        po._send_chat_notification(stage)
+
+        messages = self.MailMessage.search(domain)
+        self.assertEqual(len(messages) - before, 1)
+        self.assertEqual(messages[0].partner_ids, approvers.partner_id)
+
+    def test_stale_activities_closed_on_transition(self):
+        """Test that approval activities follow the order from stage to stage"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Activity Flow',
+            'model': 'purchase.order'
+        })
+        stage1 = self.ApprovalStage.create({
+            'name': 'Activity Stage 1',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        stage2 = self.ApprovalStage.create({
+            'name': 'Activity Stage 2',
+            'sequence': 20,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        approvers = self.env['res.users'].create([{
+            'name': f'Activity Approver {i}',
+            'login': f'activity_approver_{i}',
+            'groups_id': [(4, self.approver_group.id)]
+        } for i in range(3)])
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 50,
+            })]
+        })
+        activity_domain = [
+            ('res_model', '=', 'purchase.order'),
+            ('res_id', '=', po.id),
+            ('activity_type_id', '=', self.env.ref('multi_stage_approval.mail_activity_approval').id),
+        ]
+
+        po.action_request_approval()
+        activities = self.env['mail.activity'].search(activity_domain)
+        self.assertEqual(activities.user_id, approvers)
+        self.assertTrue(all(stage1.name in activity.summary for activity in activities))
+
+        po.with_user(approvers[0]).action_approve()
+        activities = self.env['mail.activity'].search(activity_domain)
+        self.assertEqual(po.approval_stage_id, stage2)
+        self.assertEqual(activities.user_id, approvers[1:])
+        self.assertTrue(all(stage2.name in activity.summary for activity in activities))
+
+        po.with_user(approvers[1]).action_reject()
+        self.assertFalse(self.env['mail.activity'].search_count(activity_domain))
+
+    def test_one_chatter_message_per_transition(self):
+        """Test that history rows do not add chatter messages on top of the transition message"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Single Message Flow',
+            'model': 'purchase.order'
+        })
+        stage = self.ApprovalStage.create({
+            'name': 'Single Message Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        purchase_orders = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        } for i in range(3)])
+        self.env.user.groups_id |= self.approver_group
+
+        purchase_orders.action_request_approval()
+        purchase_orders.action_reject()
+        history_messages = self.MailMessage.search([
+            ('model', '=', 'purchase.order'),
+            ('res_id', 'in', purchase_orders.ids),
+            ('body', 'ilike', 'Approval requested:'),
+        ])
+        self.assertFalse(history_messages)
+
+        # Rows created outside of a transition are logged once per document
+        po = purchase_orders[0]
+        self.env['approval.history'].create([
+            po._prepare_approval_history_vals(stage, 'requested'),
+            po._prepare_approval_history_vals(stage, 'approved'),
+        ])
+        history_messages = self.MailMessage.search([
+            ('model', '=', 'purchase.order'),
+            ('res_id', '=', po.id),
+            ('body', 'ilike', 'Approval approved:'),
+        ])
+        self.assertEqual(len(history_messages), 1)
+        self.assertIn('Approval requested:', history_messages.body)
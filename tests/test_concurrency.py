@@ -0,0 +1,138 @@
+import threading
+
+from odoo import api, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.modules.registry import Registry
+from odoo.service.model import retrying
+from odoo.tests.common import BaseCase, get_db_name, tagged
+
+
+@tagged('-standard', 'concurrency')
+class TestApprovalConcurrency(BaseCase):
+    """Stress tests running approval transitions from concurrent workers
+
+    Every worker uses its own database cursor and commits for real, so the
+    tests are opt-in: run them with --test-tags concurrency.
+    """
+
+    WORKERS = 4
+
+    def setUp(self):
+        super(TestApprovalConcurrency, self).setUp()
+        self.registry = Registry(get_db_name())
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            approver_group = env['res.groups'].create({'name': 'Concurrency Approvers'})
+            approver = env['res.users'].create({
+                'name': 'Concurrency Approver',
+                'login': 'concurrency_approver@example.com',
+                'groups_id': [(6, 0, [env.ref('base.group_user').id, approver_group.id])],
+            })
+            flow = env['approval.flow'].create({
+                'name': 'Concurrency Flow',
+                'model': 'purchase.order',
+            })
+            stages = env['approval.stage'].create([{
+                'name': 'Concurrency Stage %s' % sequence,
+                'sequence': sequence,
+                'approval_flow_id': flow.id,
+                'role_id': approver_group.id,
+            } for sequence in (10, 20)])
+            vendor = env['res.partner'].create({'name': 'Concurrency Vendor', 'supplier_rank': 1})
+            product = env['product.product'].create({'name': 'Concurrency Product', 'type': 'consu'})
+            po = env['purchase.order'].create({
+                'partner_id': vendor.id,
+                'order_line': [(0, 0, {
+                    'product_id': product.id,
+                    'product_qty': 1,
+                    'price_unit': 100,
+                })]
+            })
+            po.action_request_approval()
+            self.record_ids = {
+                'group': approver_group.id, 'approver': approver.id, 'flow': flow.id, 'stages': stages.ids,
+                'vendor': vendor.id, 'product': product.id, 'po': po.id,
+            }
+        # setUp committed for real: delete each record in a transaction of its
+        # own, in reverse order, so one failing step leaves nothing else behind
+        for model, key in [
+            ('res.groups', 'group'), ('res.users', 'approver'), ('approval.flow', 'flow'),
+            ('approval.stage', 'stages'), ('res.partner', 'vendor'), ('product.product', 'product'),
+            ('purchase.order', 'po'),
+        ]:
+            self.addCleanup(self._delete_committed, model, self.record_ids[key])
+
+    def _delete_committed(self, model, ids):
+        """Delete records committed by setUp; purchase orders are cancelled first"""
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            records = env[model].browse(ids).exists()
+            if model == 'purchase.order':
+                records.button_cancel()
+            records.unlink()
+
+    def _run_concurrently(self, action):
+        """Call action(order) from WORKERS threads at once, each in its own transaction
+
+        Concurrency failures are retried like an RPC call would be. Returns
+        the outcome of every worker: 'done', 'refused' or 'failed' when the
+        retries ran out.
+        """
+        barrier = threading.Barrier(self.WORKERS)
+        outcomes = []
+
+        def worker():
+            barrier.wait()
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, self.record_ids['approver'], {}, su=True)
+                try:
+                    retrying(lambda: action(env['purchase.order'].browse(self.record_ids['po'])), env)
+                    outcomes.append('done')
+                except UserError:
+                    cr.rollback()
+                    outcomes.append('refused')
+                except Exception:
+                    cr.rollback()
+                    outcomes.append('failed')
+
+        threads = [threading.Thread(target=worker) for i in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_approvals_approve_the_expected_stage_once(self):
+        """Test that concurrent approvals of the same stage never approve the next one"""
+        first_stage_id = self.record_ids['stages'][0]
+        outcomes = self._run_concurrently(
+            lambda order: order.with_context(approval_expected_stage_id=first_stage_id).action_approve()
+        )
+        self.assertEqual(outcomes.count('done'), 1)
+        self.assertEqual(outcomes.count('refused'), self.WORKERS - 1)
+
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            po = env['purchase.order'].browse(self.record_ids['po'])
+            self.assertEqual(po.approval_status, 'waiting')
+            self.assertEqual(po.approval_stage_id.id, self.record_ids['stages'][1])
+            approvals = env['approval.history'].search([
+                ('res_model', '=', 'purchase.order'),
+                ('res_id', '=', po.id),
+                ('action', '=', 'approved'),
+            ])
+            self.assertEqual(approvals.stage_id.ids, [first_stage_id])
+
+    def test_concurrent_rejections_reject_once(self):
+        """Test that concurrent rejections record a single rejection"""
+        outcomes = self._run_concurrently(lambda order: order.action_reject())
+        self.assertEqual(outcomes.count('done'), 1)
+
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            rejections = env['approval.history'].search_count([
+                ('res_model', '=', 'purchase.order'),
+                ('res_id', '=', self.record_ids['po']),
+                ('action', '=', 'rejected'),
+            ])
+            self.assertEqual(rejections, 1)
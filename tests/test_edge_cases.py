@@ -335,4 +335,136 @@ class TestApprovalEdgeCases(TransactionCase):
         })
 
         with self.assertRaises(UserError):
-            po2.action_request_approval()
\ No newline at end of file
+            po2.action_request_approval()
+
+    def test_overlapping_amount_bands_batch_routing(self):
+        """Test batched band routing with overlapping and open-ended bands"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Band Routing Flow',
+            'model': 'purchase.order'
+        })
+
+        low = self.ApprovalStage.create({
+            'name': 'Low Band',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'minimum_amount': 0,
+            'maximum_amount': 1000,
+        })
+        high = self.ApprovalStage.create({
+            'name': 'High Band',
+            'sequence': 20,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'minimum_amount': 1000,
+            'maximum_amount': 0,  # Open-ended
+        })
+
+        orders = self.PurchaseOrder
+        for price in (500, 1000, 250000):
+            orders += self.PurchaseOrder.create({
+                'partner_id': self.vendor.id,
+                'order_line': [(0, 0, {
+                    'product_id': self.product.id,
+                    'product_qty': 1,
+                    'price_unit': price,
+                })]
+            })
+
+        routing = self.env['advanced.approval']._get_appropriate_flows(orders)
+        self.assertEqual(len(routing), 3)
+        for order in orders:
+            self.assertEqual(routing[order.id][0], flow)
+
+        amounts_to_stages = {order.amount_total: routing[order.id][1] for order in orders}
+        self.assertEqual(amounts_to_stages[500], low)
+        self.assertEqual(amounts_to_stages[1000], low | high)  # Both bounds are inclusive
+        self.assertEqual(amounts_to_stages[250000], high)
+
+    def test_parallel_completion_uses_document_reference(self):
+        """Test that parallel approvals only count history rows of the same document"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Parallel Flow',
+            'model': 'purchase.order'
+        })
+        stage = self.ApprovalStage.create({
+            'name': 'Parallel Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'approval_type': 'parallel',
+        })
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        advanced_approval = self.env['advanced.approval']
+        self.assertFalse(advanced_approval._check_parallel_approval_complete(po, stage))
+
+        # An approval recorded on another model with the same id does not count
+        ApprovalHistory = self.env['approval.history']
+        other = ApprovalHistory.create({
+            'stage_id': stage.id,
+            'action': 'approved',
+            'user_id': self.approver_user.id,
+        })
+        other.write({'res_model': 'sale.order', 'res_id': po.id})
+        self.assertFalse(advanced_approval._check_parallel_approval_complete(po, stage))
+
+        history = ApprovalHistory.create({
+            'purchase_order_id': po.id,
+            'stage_id': stage.id,
+            'action': 'approved',
+            'user_id': self.approver_user.id,
+        })
+        self.assertEqual((history.res_model, history.res_id), ('purchase.order', po.id))
+        self.assertTrue(advanced_approval._check_parallel_approval_complete(po, stage))
+
+    def test_closed_history_archival(self):
+        """Test that the history of long-closed orders is moved into compressed archives"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Archive Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Archive Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        closed_po, waiting_po = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        } for i in range(2)])
+        (closed_po | waiting_po).action_request_approval()
+        closed_po.action_reject()
+
+        ApprovalHistory = self.env['approval.history']
+        history = ApprovalHistory.search([('res_model', '=', 'purchase.order'),
+                                          ('res_id', 'in', [closed_po.id, waiting_po.id])])
+        history.flush_recordset()
+        self.env.cr.execute("UPDATE approval_history SET date = now() - interval '400 days' WHERE id IN %s",
+                            [tuple(history.ids)])
+        self.env.invalidate_all()
+
+        # Archival is disabled until a number of days is configured
+        ArchiveModel = self.env['approval.history.archive']
+        self.assertEqual(ArchiveModel._archive_closed_history(), 0)
+        self.env['ir.config_parameter'].sudo().set_param('multi_stage_approval.history_archive_days', 365)
+
+        self.assertEqual(ArchiveModel._archive_closed_history(chunk_size=1), 1)
+        self.assertFalse(ApprovalHistory.search([('res_model', '=', 'purchase.order'), ('res_id', '=', closed_po.id)]))
+        self.assertTrue(ApprovalHistory.search([('res_model', '=', 'purchase.order'), ('res_id', '=', waiting_po.id)]))
+
+        archive = ArchiveModel.search([('res_model', '=', 'purchase.order'), ('res_id', '=', closed_po.id)])
+        self.assertEqual(archive.row_count, 2)
+        self.assertEqual([row['action'] for row in archive._get_history_rows()], ['requested', 'rejected'])
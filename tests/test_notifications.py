@@ -1,6 +1,9 @@
+from datetime import datetime, time, timedelta
+
+from odoo import fields
 from odoo.tests.common import TransactionCase
-from odoo.exceptions import UserError
-from unittest.mock import patch
+from odoo.exceptions import UserError, ValidationError
+from unittest.mock import MagicMock, patch
 
 
 class TestNotificationSystem(TransactionCase):
@@ -152,4 +155,490 @@ class TestNotificationSystem(TransactionCase):
 
             # Check that email notification was attempted for sales order
             mock_email.assert_called_once()
-            self.assertTrue(mock_email.called)
\ No newline at end of file
+            self.assertTrue(mock_email.called)
+
+    def test_approver_resolver_follows_membership(self):
+        """Test that cached approver resolution follows group membership changes"""
+        resolver = self.env['approval.approver.resolver']
+        self.assertEqual(resolver._get_approvers(self.approver_group), [])
+
+        approver_user = self.env['res.users'].create({
+            'name': 'Resolver Approver',
+            'login': 'resolver_approver@example.com',
+            'email': 'resolver_approver@example.com',
+            'groups_id': [(4, self.approver_group.id)]
+        })
+
+        approvers = resolver._get_approvers(self.approver_group)
+        self.assertEqual([a.user_id for a in approvers], [approver_user.id])
+        self.assertEqual(approvers[0].partner_id, approver_user.partner_id.id)
+        self.assertEqual(approvers[0].email, 'resolver_approver@example.com')
+        self.assertEqual(resolver._get_approvers(self.approver_group, exclude_user=approver_user), [])
+
+        approver_user.write({'groups_id': [(3, self.approver_group.id)]})
+        self.assertEqual(resolver._get_approvers(self.approver_group), [])
+
+    def test_queued_email_delivery(self):
+        """Test that queued delivery only enqueues mails and flushes them in one SMTP session"""
+        self.env['ir.config_parameter'].sudo().set_param('multi_stage_approval.email_delivery', 'queued')
+
+        flow = self.ApprovalFlow.create({
+            'name': 'Queued Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Queued Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        for i in range(3):
+            self.env['res.users'].create({
+                'name': f'Queued Approver {i}',
+                'login': f'queued_approver_{i}@example.com',
+                'email': f'queued_approver_{i}@example.com',
+                'groups_id': [(4, self.approver_group.id)]
+            })
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+
+        IrMailServer = type(self.env['ir.mail_server'])
+        smtp_stand_in = MagicMock()
+        with patch.object(IrMailServer, 'connect', return_value=smtp_stand_in) as connect, \
+                patch.object(IrMailServer, 'send_email', return_value='<queued@example.com>') as send_email:
+            po.action_request_approval()
+
+            # Nothing is sent while the approval transaction is running
+            self.assertFalse(connect.called)
+            self.assertFalse(send_email.called)
+            mails = self.env['mail.mail'].search([
+                ('model', '=', 'purchase.order'),
+                ('res_id', '=', po.id),
+                ('state', '=', 'outgoing'),
+            ])
+            self.assertTrue(mails)
+
+            # The queue processor flushes the batch over a single connection
+            mails.send()
+            self.assertEqual(connect.call_count, 1)
+            self.assertTrue(send_email.called)
+
+    def test_email_rendered_once_per_language(self):
+        """Test that request emails are rendered once per language, not per approver"""
+        self.env['res.lang']._activate_lang('fr_FR')
+
+        flow = self.ApprovalFlow.create({
+            'name': 'Language Flow',
+            'model': 'purchase.order'
+        })
+        stage = self.ApprovalStage.create({
+            'name': 'Language Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        approvers = self.env['res.users']
+        for i, lang in enumerate(['en_US', 'en_US', 'en_US', 'fr_FR', 'fr_FR']):
+            approvers |= self.env['res.users'].create({
+                'name': f'Language Approver {i}',
+                'login': f'lang_approver_{i}@example.com',
+                'email': f'lang_approver_{i}@example.com',
+                'lang': lang,
+                'groups_id': [(4, self.approver_group.id)]
+            })
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        po.write({'approval_stage_id': stage.id})
+
+        MailTemplate = type(self.MailTemplate)
+        with patch.object(MailTemplate, '_generate_template',
+                          autospec=True, side_effect=MailTemplate._generate_template) as generate:
+            po._send_email_notification(stage)
+
+        self.assertEqual(generate.call_count, 2)
+        mails = self.env['mail.mail'].search([('model', '=', 'purchase.order'), ('res_id', '=', po.id)])
+        self.assertEqual(len(mails), 2)
+        self.assertEqual(len(mails.recipient_ids), 5)
+        # Each rendering is delivered to the approvers reading its language
+        for mail in mails:
+            self.assertEqual(set(mail.recipient_ids.mapped('lang')), {mail.recipient_ids[:1].lang})
+        self.assertEqual(mails.recipient_ids, approvers.partner_id)
+
+    def test_escalation_chunks_and_cursor(self):
+        """Test that escalations are walked in chunks and resume from the saved cursor"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Escalation Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Escalation Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        purchase_orders = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        } for i in range(5)])
+        purchase_orders.action_request_approval()
+        purchase_orders.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE purchase_order SET approval_next_escalation_at = now() - interval '1 day' WHERE id IN %s",
+            [tuple(purchase_orders.ids)]
+        )
+        self.env.invalidate_all()
+
+        notification_system = self.env['approval.notification.system']
+        cursor = self.env['approval.escalation.cursor']
+        with patch(
+                'odoo.addons.multi_stage_approval.models.purchase_sale_inherit.PurchaseOrder._send_escalation_notification') as mock_escalation:
+            escalated = notification_system.check_escalations(chunk_size=2)
+            self.assertEqual(escalated, 5)
+            self.assertEqual(mock_escalation.call_count, 5)
+            self.assertFalse(cursor.search([]))
+
+            # Escalated orders are skipped by later runs
+            mock_escalation.reset_mock()
+            self.assertEqual(notification_system.check_escalations(chunk_size=2), 0)
+            self.assertFalse(mock_escalation.called)
+            self.assertEqual(set(purchase_orders.mapped('approval_escalation_level')), {1})
+            self.assertTrue(all(purchase_orders.mapped('approval_last_escalated_at')))
+
+            # A run interrupted after the third order resumes right after it
+            purchase_orders.write({'approval_escalation_level': 0})
+            purchase_orders.flush_recordset()
+            self.env.cr.execute(
+                "UPDATE purchase_order SET approval_next_escalation_at = now() - interval '1 day' WHERE id IN %s",
+                [tuple(purchase_orders.ids)]
+            )
+            self.env.invalidate_all()
+            cursor._save_position('purchase.order', purchase_orders.sorted('id')[2].id)
+            escalated = notification_system.check_escalations(chunk_size=2)
+            self.assertEqual(escalated, 2)
+            self.assertFalse(cursor.search([]))
+
+    def test_escalation_cron_exists(self):
+        """Test that the escalation engine is scheduled"""
+        cron = self.env.ref('multi_stage_approval.ir_cron_approval_escalation')
+        self.assertTrue(cron.active)
+        self.assertEqual(cron.model_id.model, 'approval.notification.system')
+
+    def test_stage_entry_sets_deadline(self):
+        """Test that entering a stage stamps the order and sets its escalation deadline"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Deadline Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Deadline Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        self.env['ir.config_parameter'].sudo().set_param('multi_stage_approval.escalation_days', 3)
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        self.assertFalse(po.approval_next_escalation_at)
+
+        po.action_request_approval()
+        self.assertTrue(po.approval_stage_entered_at)
+        self.assertEqual(po.approval_next_escalation_at, self.env['approval.working.calendar']._add_working_days(
+            po.company_id, po.approval_stage_entered_at, 3))
+
+        # Unrelated edits do not reset the escalation clock
+        entered_at = po.approval_stage_entered_at
+        po.write({'notes': 'Unrelated edit'})
+        self.assertEqual(po.approval_stage_entered_at, entered_at)
+
+    def test_multi_level_escalation_chain(self):
+        """Test that overdue orders climb the escalation chain of their stage"""
+        # Count calendar days
+        self.env.company.resource_calendar_id = False
+        escalation_group = self.ResGroups.create({'name': 'Test Escalation Group'})
+        flow = self.ApprovalFlow.create({
+            'name': 'Chain Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Chain Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'escalation_approver_days': 1,
+            'escalation_manager_days': 3,
+            'escalation_group_days': 5,
+            'escalation_group_id': escalation_group.id,
+        })
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(po.approval_stage_entered_at, days=1))
+
+        # Four days in the stage: the approvers and managers levels are due
+        entered_at = fields.Datetime.subtract(fields.Datetime.now(), days=4)
+        po.write({'approval_stage_entered_at': entered_at})
+
+        notification_system = self.env['approval.notification.system']
+        with patch(
+                'odoo.addons.multi_stage_approval.models.purchase_sale_inherit.PurchaseOrder._send_escalation_notification') as mock_escalation:
+            self.assertEqual(notification_system.check_escalations(), 1)
+            mock_escalation.assert_called_once_with(1)
+            self.assertEqual(po.approval_escalation_level, 1)
+            self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=3))
+
+            mock_escalation.reset_mock()
+            self.assertEqual(notification_system.check_escalations(), 1)
+            mock_escalation.assert_called_once_with(2)
+            self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=5))
+
+            # The group level is not due yet
+            mock_escalation.reset_mock()
+            self.assertEqual(notification_system.check_escalations(), 0)
+            self.assertFalse(mock_escalation.called)
+
+        with self.assertRaises(ValidationError):
+            self.ApprovalStage.create({
+                'name': 'Invalid Chain Stage',
+                'approval_flow_id': flow.id,
+                'role_id': self.approver_group.id,
+                'escalation_approver_days': 3,
+                'escalation_manager_days': 2,
+            })
+
+    def test_business_day_escalation_deadline(self):
+        """Test that escalation deadlines skip weekends and public holidays"""
+        calendar = self.env['resource.calendar'].create({'name': 'Test Working Week', 'tz': 'UTC'})
+        company = self.env.company
+        company.resource_calendar_id = calendar
+        working_calendar = self.env['approval.working.calendar']
+
+        today = fields.Date.today()
+        friday = datetime.combine(today + timedelta(days=(4 - today.weekday()) % 7), time(15, 0))
+        monday = friday + timedelta(days=3)
+        self.assertEqual(working_calendar._add_working_days(company, friday, 1), monday)
+        self.assertEqual(working_calendar._add_working_days(company, friday + timedelta(days=1), 2),
+                         monday + timedelta(days=1))
+
+        # A public holiday on Monday pushes the deadline and refreshes the cached table
+        self.env['resource.calendar.leaves'].create({
+            'name': 'Public Holiday',
+            'calendar_id': calendar.id,
+            'date_from': datetime.combine(monday, time.min),
+            'date_to': datetime.combine(monday, time(23, 59, 59)),
+        })
+        self.assertEqual(working_calendar._add_working_days(company, friday, 1), monday + timedelta(days=1))
+
+        # So does a holiday of the whole company set on no calendar
+        self.env['resource.calendar.leaves'].create({
+            'name': 'Company Holiday',
+            'calendar_id': False,
+            'company_id': company.id,
+            'date_from': datetime.combine(monday + timedelta(days=1), time.min),
+            'date_to': datetime.combine(monday + timedelta(days=1), time(23, 59, 59)),
+        })
+        self.assertEqual(working_calendar._add_working_days(company, friday, 1), monday + timedelta(days=2))
+
+    def test_holiday_reschedules_waiting_orders(self):
+        """Test that a new public holiday moves the deadlines stored on waiting orders"""
+        calendar = self.env['resource.calendar'].create({'name': 'Test Holiday Week', 'tz': 'UTC'})
+        self.env.company.resource_calendar_id = calendar
+        flow = self.ApprovalFlow.create({
+            'name': 'Holiday Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Holiday Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'escalation_approver_days': 1,
+        })
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+        deadline = po.approval_next_escalation_at
+
+        self.env['resource.calendar.leaves'].create({
+            'name': 'Deadline Holiday',
+            'calendar_id': calendar.id,
+            'date_from': datetime.combine(deadline.date(), time.min),
+            'date_to': datetime.combine(deadline.date(), time(23, 59, 59)),
+        })
+        self.assertGreater(po.approval_next_escalation_at, deadline)
+        self.assertEqual(po.approval_next_escalation_at, self.env['approval.working.calendar']._add_working_days(
+            po.company_id, po.approval_stage_entered_at, 1))
+
+    def test_business_day_escalation_deadline_in_calendar_timezone(self):
+        """Test that working days are counted from the local day of the calendar timezone"""
+        calendar = self.env['resource.calendar'].create({'name': 'Test Tokyo Week', 'tz': 'Asia/Tokyo'})
+        company = self.env.company
+        company.resource_calendar_id = calendar
+        working_calendar = self.env['approval.working.calendar']
+
+        today = fields.Date.today()
+        friday = datetime.combine(today + timedelta(days=(4 - today.weekday()) % 7), time(0, 0))
+        # Friday 20:00 UTC is already Saturday 05:00 in Tokyo, so the next
+        # working day is Monday 05:00 in Tokyo, Sunday 20:00 UTC
+        self.assertEqual(working_calendar._add_working_days(company, friday + timedelta(hours=20), 1),
+                         friday + timedelta(days=2, hours=20))
+        # Thursday 20:00 UTC is Friday 05:00 in Tokyo
+        self.assertEqual(working_calendar._add_working_days(company, friday - timedelta(hours=4), 1),
+                         friday + timedelta(days=2, hours=20))
+
+    def test_escalation_days_setting_applies(self):
+        """Test that the escalation days saved in the settings reach the escalation engine"""
+        notification_system = self.env['approval.notification.system']
+        self.env['res.config.settings'].create({'approval_escalation_days': 5}).execute()
+        self.assertEqual(notification_system._get_default_escalation_days(), 5)
+        self.assertEqual(self.env['approval.settings']._get_settings().escalation_days, 5)
+
+    def test_escalation_rescheduled_on_configuration_change(self):
+        """Test that waiting orders follow changes of their stage chain and of the default delay"""
+        # Count calendar days
+        self.env.company.resource_calendar_id = False
+        flow = self.ApprovalFlow.create({
+            'name': 'Reschedule Flow',
+            'model': 'purchase.order'
+        })
+        stage = self.ApprovalStage.create({
+            'name': 'Reschedule Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        self.env['res.config.settings'].create({'approval_escalation_days': 2}).execute()
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+        entered_at = po.approval_stage_entered_at
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=2))
+
+        self.env['res.config.settings'].create({'approval_escalation_days': 4}).execute()
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=4))
+
+        stage.escalation_approver_days = 1
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=1))
+
+        # An exhausted chain picks up a level added later
+        po.approval_escalation_level = 1
+        self.assertFalse(po.approval_next_escalation_at)
+        stage.escalation_manager_days = 3
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=3))
+
+        # Rescheduling walks the waiting orders chunk by chunk
+        po.approval_escalation_level = 0
+        stage.escalation_approver_days = 0
+        other_po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        other_po.action_request_approval()
+        self.env['ir.config_parameter'].sudo().set_param('multi_stage_approval.escalation_days', 6)
+        self.env['approval.notification.system']._recompute_escalation_dates(chunk_size=1)
+        for order in po | other_po:
+            self.assertEqual(order.approval_next_escalation_at,
+                             fields.Datetime.add(order.approval_stage_entered_at, days=6))
+
+        # Closed orders have no escalation left and are not rescheduled
+        other_po.action_reject()
+        self.assertFalse(other_po.approval_next_escalation_at)
+        stage.escalation_approver_days = 1
+        self.assertFalse(other_po.approval_next_escalation_at)
+        self.assertEqual(po.approval_next_escalation_at, fields.Datetime.add(entered_at, days=1))
+
+        # A new company calendar reschedules the waiting orders of the company
+        calendar = self.env['resource.calendar'].create({'name': 'Reschedule Week', 'tz': 'UTC'})
+        self.env.company.resource_calendar_id = calendar
+        self.assertEqual(po.approval_next_escalation_at,
+                         self.env['approval.working.calendar']._add_working_days(po.company_id, entered_at, 1))
+
+    def test_escalation_email_reaches_level_audience(self):
+        """Test that escalation emails are delivered to the audience of their level"""
+        escalation_group = self.ResGroups.create({'name': 'Test Escalation Audience'})
+        escalation_user = self.env['res.users'].create({
+            'name': 'Escalation Officer',
+            'login': 'escalation_officer@example.com',
+            'email': 'escalation_officer@example.com',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id, escalation_group.id])],
+        })
+        flow = self.ApprovalFlow.create({
+            'name': 'Audience Flow',
+            'model': 'purchase.order'
+        })
+        self.ApprovalStage.create({
+            'name': 'Audience Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'escalation_approver_days': 1,
+            'escalation_manager_days': 2,
+            'escalation_group_days': 3,
+            'escalation_group_id': escalation_group.id,
+        })
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+
+        existing_mails = self.env['mail.mail'].search([('model', '=', 'purchase.order'), ('res_id', '=', po.id)])
+        po._send_escalation_notification(3)
+        mail = self.env['mail.mail'].search([
+            ('model', '=', 'purchase.order'),
+            ('res_id', '=', po.id),
+            ('id', 'not in', existing_mails.ids),
+        ])
+        self.assertEqual(len(mail), 1)
+        self.assertEqual(mail.recipient_ids, escalation_user.partner_id)
+        self.assertFalse(mail.email_to)
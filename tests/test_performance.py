@@ -1,4 +1,5 @@
 from odoo.tests.common import TransactionCase, tagged
+from odoo.exceptions import UserError
 import time
 import logging
 
@@ -247,4 +248,108 @@ class TestApprovalPerformance(TransactionCase):
         _logger.info("Complex domain search found %d orders in %.4f seconds",
                      len(complex_results), complex_time)
 
-        self.assertLess(complex_time, 1.0, "Complex domain search should be fast")
\ No newline at end of file
+        self.assertLess(complex_time, 1.0, "Complex domain search should be fast")
+
+    def test_batched_approval_request(self):
+        """Test requesting approval on a whole recordset at once"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Batch Request Flow',
+            'model': 'purchase.order'
+        })
+
+        stage = self.ApprovalStage.create({
+            'name': 'Batch Stage',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+
+        purchase_orders = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100 + i,
+            })]
+        } for i in range(50)])
+
+        # One invalid order blocks the batch and is reported
+        purchase_orders[:2].write({'approval_status': 'rejected'})
+        with self.assertRaises(UserError):
+            purchase_orders.action_request_approval()
+        self.assertEqual(set(purchase_orders[2:].mapped('approval_status')), {'draft'})
+
+        purchase_orders[:2].write({'approval_status': 'draft'})
+        start_time = time.time()
+        purchase_orders.action_request_approval()
+        _logger.info("Batch requested approval for %d orders in %.2f seconds",
+                     len(purchase_orders), time.time() - start_time)
+
+        self.assertEqual(set(purchase_orders.mapped('approval_status')), {'waiting'})
+        self.assertEqual(purchase_orders.approval_stage_id, stage)
+        history_count = self.env['approval.history'].search_count([
+            ('purchase_order_id', 'in', purchase_orders.ids),
+            ('action', '=', 'requested'),
+        ])
+        self.assertEqual(history_count, len(purchase_orders))
+
+    def test_batched_approve_and_reject(self):
+        """Test approving and rejecting whole recordsets across stages"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Batch Approval Flow',
+            'model': 'purchase.order'
+        })
+
+        stage1 = self.ApprovalStage.create({
+            'name': 'Batch Stage 1',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        stage2 = self.ApprovalStage.create({
+            'name': 'Batch Stage 2',
+            'sequence': 20,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'is_final_approval': True,
+        })
+
+        purchase_orders = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100 + i,
+            })]
+        } for i in range(30)])
+        purchase_orders.action_request_approval()
+
+        # Put part of the batch one stage ahead so the selection spans two stages
+        ahead = purchase_orders[:10]
+        ahead.with_user(self.approver_user).action_approve()
+        self.assertEqual(ahead.approval_stage_id, stage2)
+
+        purchase_orders[:20].with_user(self.approver_user).action_approve()
+        self.assertEqual(set(ahead.mapped('approval_status')), {'approved'})
+        self.assertEqual(purchase_orders[10:20].approval_stage_id, stage2)
+        self.assertEqual(set(purchase_orders[10:20].mapped('approval_status')), {'waiting'})
+
+        purchase_orders[20:].with_user(self.approver_user).action_reject()
+        self.assertEqual(set(purchase_orders[20:].mapped('approval_status')), {'rejected'})
+        self.assertEqual(purchase_orders[20:].approval_stage_id, stage1)
+
+        history_count = self.env['approval.history'].search_count([
+            ('purchase_order_id', 'in', purchase_orders.ids),
+        ])
+        self.assertEqual(history_count, 30 + 10 + 20 + 10)
+
+    def test_history_indexes(self):
+        """Test that the approval history lookups are backed by indexes"""
+        self.env.cr.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'approval_history'"
+        )
+        indexes = dict(self.env.cr.fetchall())
+        self.assertIn('approval_history_purchase_order_date_index', indexes)
+        self.assertIn('approval_history_sale_order_date_index', indexes)
+        self.assertIn('approval_history_stage_action_index', indexes)
+        self.assertIn('USING brin', indexes['approval_history_date_brin_index'])
@@ -169,4 +169,268 @@ class TestPurchaseApproval(TransactionCase):
         # Admin user should get empty domain
         self.env.user.groups_id -= self.approver_group
         admin_domain = self.PurchaseOrder._get_approval_domain()
-        self.assertEqual(admin_domain, [])
\ No newline at end of file
+        self.assertEqual(admin_domain, [])
+
+    def test_stage_path_frozen_on_request(self):
+        """Test that the stage path is frozen on the order when approval is requested"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Frozen Path Flow',
+            'model': 'purchase.order'
+        })
+
+        stage1 = self.ApprovalStage.create({
+            'name': 'Stage 1',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+        stage2 = self.ApprovalStage.create({
+            'name': 'Stage 2',
+            'sequence': 20,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        })
+
+        self.env.user.groups_id |= self.approver_group
+        po.action_request_approval()
+        self.assertEqual(po._get_approval_stage_path(), [stage1.id, stage2.id])
+        self.assertEqual(po.approval_stage_position, 0)
+
+        # A stage inserted after the request does not change the routed path
+        self.ApprovalStage.create({
+            'name': 'Late Stage',
+            'sequence': 15,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+        })
+
+        po.with_context(approval_expected_stage_id=stage1.id).action_approve()
+        self.assertEqual(po.approval_stage_id, stage2)
+        self.assertEqual(po.approval_stage_position, 1)
+
+        # A retried click aimed at the first stage does not approve the second one
+        with self.assertRaises(UserError):
+            po.with_context(approval_expected_stage_id=stage1.id).action_approve()
+        self.assertEqual(po.approval_stage_id, stage2)
+
+        po.action_approve()
+        self.assertEqual(po.approval_status, 'approved')
+
+    def test_parallel_stage_waits_for_tally(self):
+        """Test that a parallel stage advances once every approver required at entry approved"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Parallel Flow',
+            'model': 'purchase.order',
+            'company_id': self.env.company.id
+        })
+        parallel_stage = self.ApprovalStage.create({
+            'name': 'Board Approval',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'approval_type': 'parallel',
+        })
+        approvers = self.env['res.users'].create([{
+            'name': 'Board Member %s' % i,
+            'login': 'board_member_%s@example.com' % i,
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('purchase.group_purchase_user').id,
+                self.approver_group.id,
+            ])],
+        } for i in range(2)])
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 10,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+
+        tally = self.env['approval.parallel.tally']._get_tallies(po, parallel_stage)
+        self.assertEqual(tally.required_user_ids, approvers)
+        self.assertEqual(tally.required_count, 2)
+
+        po.with_user(approvers[0]).action_approve()
+        self.assertEqual(tally.approval_count, 1)
+        self.assertEqual(po.approval_status, 'waiting')
+        self.assertFalse(self.env['advanced.approval']._check_parallel_approval_complete(po, parallel_stage))
+        self.assertTrue(any(
+            'Approved by Board Member 0 (1/2)' in body for body in po.message_ids.mapped('body')
+        ))
+
+        po.with_user(approvers[1]).action_approve()
+        self.assertTrue(tally._is_complete())
+        self.assertEqual(po.approval_status, 'approved')
+
+    def test_parallel_uncounted_approval_refused(self):
+        """Test that repeated approvals and approvers not required at stage entry are refused"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Repeat Flow',
+            'model': 'purchase.order',
+            'company_id': self.env.company.id
+        })
+        parallel_stage = self.ApprovalStage.create({
+            'name': 'Repeat Approval',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'approval_type': 'parallel',
+        })
+        approvers = self.env['res.users'].create([{
+            'name': 'Repeat Member %s' % i,
+            'login': 'repeat_member_%s@example.com' % i,
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('purchase.group_purchase_user').id,
+                self.approver_group.id,
+            ])],
+        } for i in range(2)])
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 10,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+
+        po.with_user(approvers[0]).action_approve()
+        with self.assertRaisesRegex(UserError, 'already approved'):
+            po.with_user(approvers[0]).action_approve()
+        self.assertEqual(po.approval_status, 'waiting')
+
+        history = self.env['approval.history'].search([
+            ('res_model', '=', 'purchase.order'),
+            ('res_id', '=', po.id),
+            ('action', '=', 'approved'),
+            ('user_id', '=', approvers[0].id),
+        ])
+        self.assertEqual(len(history), 1)
+        messages = po.message_ids.filtered(lambda message: 'Approved by Repeat Member 0' in message.body)
+        self.assertEqual(len(messages), 1)
+
+        # A user who joined the group after the order entered the stage
+        latecomer = self.env['res.users'].create({
+            'name': 'Repeat Latecomer',
+            'login': 'repeat_latecomer@example.com',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('purchase.group_purchase_user').id,
+                self.approver_group.id,
+            ])],
+        })
+        with self.assertRaisesRegex(UserError, 'not among the approvers'):
+            po.with_user(latecomer).action_approve()
+        self.assertFalse(self.env['approval.history'].search([
+            ('res_model', '=', 'purchase.order'),
+            ('res_id', '=', po.id),
+            ('user_id', '=', latecomer.id),
+        ]))
+        self.assertEqual(po.approval_status, 'waiting')
+
+    def test_parallel_stage_quorum(self):
+        """Test that parallel stages complete on their quorum"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Quorum Flow',
+            'model': 'purchase.order',
+            'company_id': self.env.company.id
+        })
+        quorum_stage = self.ApprovalStage.create({
+            'name': 'Committee Approval',
+            'sequence': 10,
+            'approval_flow_id': flow.id,
+            'role_id': self.approver_group.id,
+            'approval_type': 'parallel',
+            'quorum_type': 'count',
+            'quorum_count': 2,
+        })
+        self.assertEqual(quorum_stage._get_quorum(3), 2)
+        self.assertEqual(quorum_stage._get_quorum(1), 1)
+        quorum_stage.write({'quorum_type': 'percentage', 'quorum_percentage': 50})
+        self.assertEqual(quorum_stage._get_quorum(3), 2)
+        quorum_stage.write({'quorum_type': 'any'})
+        self.assertEqual(quorum_stage._get_quorum(3), 1)
+        with self.assertRaises(ValidationError):
+            quorum_stage.write({'quorum_type': 'count', 'quorum_count': 0})
+
+        approvers = self.env['res.users'].create([{
+            'name': 'Committee Member %s' % i,
+            'login': 'committee_member_%s@example.com' % i,
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('purchase.group_purchase_user').id,
+                self.approver_group.id,
+            ])],
+        } for i in range(3)])
+        quorum_stage.write({'quorum_type': 'count', 'quorum_count': 2})
+        po = self.PurchaseOrder.create({
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 10,
+                'price_unit': 100,
+            })]
+        })
+        po.action_request_approval()
+
+        po.with_user(approvers[0]).action_approve()
+        self.assertEqual(po.approval_status, 'waiting')
+        po.with_user(approvers[2]).action_approve()
+        self.assertEqual(po.approval_status, 'approved')
+
+    def test_idempotent_approval_actions(self):
+        """Test that replayed approval actions with an idempotency key run only once"""
+        flow = self.ApprovalFlow.create({
+            'name': 'Idempotent Flow',
+            'model': 'purchase.order',
+            'company_id': self.env.company.id
+        })
+        for sequence in (10, 20):
+            self.ApprovalStage.create({
+                'name': 'Idempotent Stage %s' % sequence,
+                'sequence': sequence,
+                'approval_flow_id': flow.id,
+                'role_id': self.approver_group.id,
+            })
+        self.env.user.groups_id |= self.approver_group
+        po, other_po = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 10,
+                'price_unit': 100,
+            })]
+        } for i in range(2)])
+
+        po.action_request_approval(idempotency_key='request-1')
+        po.action_request_approval(idempotency_key='request-1')
+        po.with_context(approval_idempotency_key='approve-1').action_approve()
+        po.with_context(approval_idempotency_key='approve-1').action_approve()
+
+        history = self.ApprovalHistory.search([('res_model', '=', 'purchase.order'), ('res_id', '=', po.id)])
+        self.assertEqual(sorted(history.mapped('action')), ['approved', 'requested'])
+        self.assertEqual(po.approval_status, 'waiting')
+
+        with self.assertRaises(UserError):
+            other_po.action_request_approval(idempotency_key='request-1')
+
+        # Expired keys are pruned and can be used again
+        IdempotencyKey = self.env['approval.idempotency.key']
+        keys = IdempotencyKey.search([('user_id', '=', self.env.uid), ('key', 'in', ['request-1', 'approve-1'])])
+        self.assertEqual(len(keys), 2)
+        keys.write({'expires_at': '2000-01-01 00:00:00'})
+        IdempotencyKey._cron_prune_expired()
+        self.assertFalse(keys.exists())
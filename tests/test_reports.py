@@ -1,3 +1,4 @@
+from odoo import fields
 from odoo.tests.common import TransactionCase
 from odoo.exceptions import UserError
 
@@ -75,12 +76,58 @@ class TestApprovalReports(TransactionCase):
 
         self.assertIn('purchase_orders', report_values)
         self.assertIn('sales_orders', report_values)
-        self.assertIn('draft_orders', report_values)
-        self.assertIn('waiting_orders', report_values)
-        self.assertIn('approved_orders', report_values)
-        self.assertIn('rejected_orders', report_values)
+        self.assertIn('draft_count', report_values)
+        self.assertIn('waiting_count', report_values)
+        self.assertIn('approved_count', report_values)
+        self.assertIn('rejected_count', report_values)
+        self.assertIn('total_count', report_values)
         self.assertIn('company', report_values)
 
+    def test_summary_report_counts(self):
+        """Test that the summary report counts orders per approval status across both models"""
+        approver_group = self.env['res.groups'].create({'name': 'Report Approvers'})
+        for model_name in ('purchase.order', 'sale.order'):
+            flow = self.ApprovalFlow.create({
+                'name': 'Report Flow %s' % model_name,
+                'model': model_name
+            })
+            self.env['approval.stage'].create({
+                'name': 'Report Stage',
+                'sequence': 10,
+                'approval_flow_id': flow.id,
+                'role_id': approver_group.id,
+            })
+        purchase_orders = self.PurchaseOrder.create([{
+            'partner_id': self.vendor.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_qty': 1,
+                'price_unit': 100,
+            })]
+        } for i in range(3)])
+        sales_orders = self.SaleOrder.create([{
+            'partner_id': self.customer.id,
+            'order_line': [(0, 0, {
+                'product_id': self.product.id,
+                'product_uom_qty': 1,
+                'price_unit': 100,
+            })]
+        } for i in range(2)])
+        purchase_orders.action_request_approval()
+        sales_orders.action_request_approval()
+        purchase_orders[0].action_reject()
+
+        report_model = self.env['report.multi_stage_approval.report_approval_summary']
+        tomorrow = fields.Date.to_string(fields.Date.add(fields.Date.today(), days=1))
+        report_values = report_model.with_context(date_to=tomorrow)._get_report_values(docids=None, data=None)
+
+        self.assertEqual(report_values['purchase_count'], 3)
+        self.assertEqual(report_values['sales_count'], 2)
+        self.assertEqual(report_values['waiting_count'], 4)
+        self.assertEqual(report_values['rejected_count'], 1)
+        self.assertEqual(report_values['total_count'], 5)
+        self.assertEqual(report_values['purchase_orders'], purchase_orders)
+
     def test_report_actions_exist(self):
         """Test that all report actions are properly defined"""
         report_actions = [